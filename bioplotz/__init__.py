@@ -1,4 +1,23 @@
 from .chromosome import chromosome as chromosome
+from .chromosome import feature_density as feature_density
+from .chromosome import interval_index as interval_index
+from .chromosome import read_bed as read_bed
+from .chromosome import read_bedgraph as read_bedgraph
+from .chromosome import read_centromeres as read_centromeres
+from .chromosome import read_fai as read_fai
+from .chromosome import read_gff3 as read_gff3
 from .genecluster import genecluster as genecluster
+from .genecluster import genecluster_stack as genecluster_stack
+from .genecluster import gff_index as gff_index
 from .manhattan import manhattan as manhattan
+from .manhattan import manhattan_batch as manhattan_batch
+from .manhattan import read_sumstats as read_sumstats
+from .multialign import alignment as alignment
+from .multialign import column_stats as column_stats
 from .multialign import multialign as multialign
+from .multialign import multialign_pages as multialign_pages
+from .multialign import read_aligned_fasta as read_aligned_fasta
+from .multialign import read_clustal as read_clustal
+from .multialign import read_stockholm as read_stockholm
+from .qq import lambda_gc as lambda_gc
+from .qq import qq as qq
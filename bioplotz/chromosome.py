@@ -1,10 +1,421 @@
-from operator import is_none
+import gzip
+from concurrent.futures import ProcessPoolExecutor
 
 import matplotlib as mpl
 import matplotlib.pyplot as plt
 import numpy as np
+import pandas as pd
+from matplotlib.collections import LineCollection, PolyCollection
 from typing import Union
 
+from .manhattan import _composite, _disc_offsets, _stamp_counts
+
+
+class _IntervalIndex(object):
+    """
+    Intervals of each chromosome sorted by start positions, overlapping intervals of a region
+    are found with searchsorted on starts and running maximum of ends
+    """
+
+    def __init__(self, chr_db: dict):
+        # chr_db: {chrn: (sorted starts, ends, [other columns])}
+        self.__chr_db = {}
+        self.__cnt = 0
+        for chrn, (sp, ep, cols) in chr_db.items():
+            self.__chr_db[chrn] = (sp, ep, np.maximum.accumulate(ep), cols)
+            self.__cnt += len(sp)
+
+    @staticmethod
+    def __to_array(values):
+        """
+        Convert column to 1-d array, only numeric columns are converted to numeric arrays,
+        others like markers or colors are kept as objects, so that mixed markers like ["o", 4] are not converted to strings
+        """
+        try:
+            arr = np.asarray(values)
+        except ValueError:
+            arr = None
+        if arr is None or arr.ndim != 1 or arr.dtype.kind not in "biuf":
+            arr = np.empty(len(values), dtype=object)
+            arr[:] = list(values)
+        return arr
+
+    @classmethod
+    def from_columns(cls, chr_names, sp, ep, cols):
+        """
+        Build index with parallel arrays of chromosome names, starts, ends and other columns
+        """
+        codes, names = pd.factorize(np.asarray(chr_names, dtype=object), sort=True)
+        return cls.from_codes(codes, names, sp, ep, cols)
+
+    @classmethod
+    def from_codes(cls, codes, names, sp, ep, cols):
+        """
+        Build index with chromosome codes, which are indices of names
+        """
+        codes = np.asarray(codes)
+        sp = np.asarray(sp)
+        ep = np.asarray(ep)
+        cols = [cls.__to_array(_) for _ in cols]
+        order = np.lexsort((sp, codes))
+        bounds = np.searchsorted(codes[order], np.arange(len(names) + 1))
+        chr_db = {}
+        for i, chrn in enumerate(names):
+            idx = order[bounds[i] : bounds[i + 1]]
+            chr_db[chrn] = (sp[idx], ep[idx], [_[idx] for _ in cols])
+        return cls(chr_db)
+
+    def __len__(self):
+        return self.__cnt
+
+    def __contains__(self, chrn):
+        return chrn in self.__chr_db
+
+    def chromosomes(self):
+        return list(self.__chr_db)
+
+    def get(self, chrn: str):
+        """
+        All intervals of chromosome chrn, return starts, ends and list of other columns
+        """
+        sp, ep, _, cols = self.__chr_db[chrn]
+        return sp, ep, cols
+
+    def query_index(self, chrn: str, start: float, end: float):
+        """
+        Indices of intervals overlapping with [start, end] in chromosome chrn
+        """
+        if chrn not in self.__chr_db:
+            return np.array([], dtype=np.int64)
+        sp, ep, max_ep, _ = self.__chr_db[chrn]
+        lo = np.searchsorted(max_ep, start, side="left")
+        hi = np.searchsorted(sp, end, side="right")
+        idx = np.arange(lo, hi)
+        return idx[ep[lo:hi] >= start]
+
+    def query(self, chrn: str, start: float, end: float):
+        """
+        Intervals overlapping with [start, end] in chromosome chrn
+        return starts, ends and list of other columns
+        """
+        idx = self.query_index(chrn, start, end)
+        if chrn not in self.__chr_db:
+            return idx, idx, []
+        sp, ep, _, cols = self.__chr_db[chrn]
+        return sp[idx], ep[idx], [_[idx] for _ in cols]
+
+    def columns(self, regions: list = None):
+        """
+        Concatenate intervals of all chromosomes, or only intervals overlapping with regions
+        return chromosome names, starts, ends and list of other columns
+        """
+        parts = []
+        if regions is None:
+            for chrn, (sp, ep, _, cols) in self.__chr_db.items():
+                parts.append((chrn, sp, ep, cols))
+        else:
+            region_db = {}
+            for chrn, start, end in regions:
+                region_db.setdefault(chrn, []).append(self.query_index(chrn, start, end))
+            for chrn in region_db:
+                if chrn not in self.__chr_db:
+                    continue
+                # intervals overlapping with several regions are kept once
+                idx = np.unique(np.concatenate(region_db[chrn]))
+                sp, ep, _, cols = self.__chr_db[chrn]
+                parts.append((chrn, sp[idx], ep[idx], [_[idx] for _ in cols]))
+
+        if not parts:
+            return np.array([], dtype=object), np.array([]), np.array([]), []
+        chr_names = np.repeat(
+            np.array([_[0] for _ in parts], dtype=object), [len(_[1]) for _ in parts]
+        )
+        sp = np.concatenate([_[1] for _ in parts])
+        ep = np.concatenate([_[2] for _ in parts])
+        cols = [
+            np.concatenate([_[3][i] for _ in parts]) for i in range(len(parts[0][3]))
+        ]
+        return chr_names, sp, ep, cols
+
+
+def interval_index(data: list):
+    """
+    Build interval index with records like [chrn, sp, ep, value, ...],
+    the index could be passed to chromosome as inner_data or outer_data and reused
+    """
+    if isinstance(data, _IntervalIndex):
+        return data
+    if len(data) == 0:
+        return _IntervalIndex({})
+    columns = list(zip(*data))
+    return _IntervalIndex.from_columns(
+        columns[0], columns[1], columns[2], columns[3:]
+    )
+
+
+def _count_header_lines(path):
+    """
+    Count leading "track", "browser" and comment lines, which have different columns with records
+    """
+    cnt = 0
+    with (gzip.open(path, "rt") if path.endswith(".gz") else open(path)) as fin:
+        for line in fin:
+            if not line.startswith(("track", "browser", "#")) and line.strip():
+                break
+            cnt += 1
+    return cnt
+
+
+def _read_chunks(path, usecols, chrom_col, chunksize, column_cnt=None):
+    """
+    Read tab separated annotation file (plain text or gzipped) without header chunk by chunk,
+    lines start with "#" (like "###" of GFF3) are skipped, "#" in other places is kept as part of fields,
+    if column_cnt is set, all columns are read and short lines (like sequences after ##FASTA of GFF3)
+    are filled with nan, which could not be read with usecols
+    """
+    reader = pd.read_csv(
+        path,
+        sep="\t",
+        header=None,
+        skiprows=_count_header_lines(path),
+        usecols=sorted(set(usecols) | {0}) if column_cnt is None else None,
+        names=None if column_cnt is None else range(column_cnt),
+        dtype={0: str, chrom_col: str},
+        chunksize=chunksize,
+        compression="infer",
+        low_memory=False,
+    )
+    for chunk in reader:
+        is_comment = chunk[0].str.startswith("#", na=False).to_numpy()
+        yield chunk[~is_comment] if is_comment.any() else chunk
+
+
+def _read_intervals(
+        path: str,
+        chrom_col: int,
+        start_col: int,
+        end_col: int,
+        value_col: int = None,
+        start_offset: int = 0,
+        row_filter=None,
+        filter_cols: list = None,
+        fill_value: float = None,
+        column_cnt: int = None,
+        chunksize: int = 1000000,
+):
+    """
+    Stream intervals from annotation file into interval index, with int64 starts and ends and float32 values,
+    lines which starts or ends could not be parsed (like "track" or "browser" lines) are skipped
+    """
+    usecols = sorted(
+        {chrom_col, start_col, end_col}
+        | ({value_col} if value_col is not None else set())
+        | set(filter_cols if filter_cols else [])
+    )
+    chrom_idx_db = {}
+    chrom_list = []
+    sp_list = []
+    ep_list = []
+    value_list = []
+    for chunk in _read_chunks(path, usecols, chrom_col, chunksize, column_cnt):
+        if row_filter is not None:
+            chunk = chunk[row_filter(chunk)]
+        sp = pd.to_numeric(chunk[start_col], errors="coerce").to_numpy(dtype=np.float64)
+        ep = pd.to_numeric(chunk[end_col], errors="coerce").to_numpy(dtype=np.float64)
+        if value_col is None:
+            values = np.ones(len(chunk), dtype=np.float32)
+        else:
+            values = pd.to_numeric(chunk[value_col], errors="coerce").to_numpy(
+                dtype=np.float32
+            )
+            if fill_value is not None:
+                values[np.isnan(values)] = fill_value
+        retain = ~np.isnan(sp) & ~np.isnan(ep) & chunk[chrom_col].notna().to_numpy()
+        if not retain.all():
+            chunk = chunk[retain]
+            sp, ep, values = sp[retain], ep[retain], values[retain]
+
+        codes, uniques = pd.factorize(chunk[chrom_col].to_numpy())
+        for chrn in uniques:
+            if chrn not in chrom_idx_db:
+                chrom_idx_db[chrn] = len(chrom_idx_db)
+        lut = np.array([chrom_idx_db[_] for _ in uniques], dtype=np.int32)
+        chrom_list.append(lut[codes] if len(lut) else np.empty(0, dtype=np.int32))
+        sp_list.append(sp.astype(np.int64) + start_offset)
+        ep_list.append(ep.astype(np.int64))
+        value_list.append(values)
+
+    if not chrom_list:
+        raise ValueError("No data found in %s" % path)
+    return _IntervalIndex.from_codes(
+        np.concatenate(chrom_list),
+        list(chrom_idx_db),
+        np.concatenate(sp_list),
+        np.concatenate(ep_list),
+        [np.concatenate(value_list)],
+    )
+
+
+def read_bed(path: str, value_col: int = None, chunksize: int = 1000000):
+    """
+    Read BED file (plain text or gzipped) chunk by chunk, starts are converted to 1-based,
+    values are read from column value_col (0-based, like 4 for score), or 1 if value_col is None
+    return interval index which could be used as inner_data or outer_data of chromosome
+    """
+    return _read_intervals(
+        path, 0, 1, 2, value_col, start_offset=1, chunksize=chunksize
+    )
+
+
+def read_bedgraph(path: str, chunksize: int = 1000000):
+    """
+    Read bedGraph file (plain text or gzipped) chunk by chunk, starts are converted to 1-based
+    return interval index which could be used as inner_data or outer_data of chromosome
+    """
+    return _read_intervals(path, 0, 1, 2, 3, start_offset=1, chunksize=chunksize)
+
+
+def read_gff3(
+        path: str, feature_type: Union[str, list] = "gene", chunksize: int = 1000000
+):
+    """
+    Read features of GFF3 file (plain text or gzipped) chunk by chunk, only features with feature_type are kept,
+    all features are kept if feature_type is None, values are scores of features, missing scores are 1
+    return interval index which could be used as inner_data or outer_data of chromosome
+    """
+    row_filter = None
+    if feature_type is not None:
+        if isinstance(feature_type, str):
+            feature_type = [feature_type]
+
+        def type_filter(chunk):
+            return chunk[2].isin(feature_type).to_numpy()
+
+        row_filter = type_filter
+
+    return _read_intervals(
+        path,
+        0,
+        3,
+        4,
+        5,
+        row_filter=row_filter,
+        filter_cols=[2],
+        fill_value=1,
+        column_cnt=9,
+        chunksize=chunksize,
+    )
+
+
+def read_fai(path: str):
+    """
+    Read chromosome lengths from .fai (or chrom.sizes) file
+    return dict which could be used as chr_len_db of chromosome
+    """
+    data = pd.read_csv(path, sep="\t", header=None, usecols=[0, 1], dtype={0: str})
+    data = data[~data[0].str.startswith("#", na=False)]
+    return dict(zip(data[0], data[1].astype(np.int64).tolist()))
+
+
+def read_centromeres(path: str):
+    """
+    Read centromere regions from BED file, the middle position of all regions in one chromosome is used
+    return dict which could be used as centro_db of chromosome
+    """
+    index = read_bed(path)
+    centro_db = {}
+    for chrn in index.chromosomes():
+        sp, ep, _ = index.get(chrn)
+        centro_db[chrn] = (sp.min() + ep.max()) / 2.0
+    return centro_db
+
+
+def _window_density(job):
+    """
+    Count features overlapping with each window, or the fraction of bases covered by features in each window,
+    features are 1-based closed intervals
+    """
+    sp, ep, chr_len, window, mode = job
+    win_cnt = int(np.ceil(chr_len / window))
+    # convert to 0-based half-open intervals in the chromosome
+    sp = np.clip(np.asarray(sp, dtype=np.int64) - 1, 0, chr_len)
+    ep = np.clip(np.asarray(ep, dtype=np.int64), 0, chr_len)
+    valid = ep > sp
+    sp, ep = sp[valid], ep[valid]
+    first = sp // window
+    last = (ep - 1) // window
+
+    if mode == "count":
+        diff = np.bincount(first, minlength=win_cnt + 1)
+        diff -= np.bincount(last + 1, minlength=win_cnt + 1)
+        values = np.cumsum(diff[:win_cnt])
+    else:
+        # features in one window are summed directly, others are split into the first window,
+        # the last window and full windows between them
+        single = first == last
+        # values start as float, bincount of empty arrays with int weights returns int
+        values = np.zeros(win_cnt, dtype=np.float64)
+        values += np.bincount(
+            first[single], weights=ep[single] - sp[single], minlength=win_cnt
+        )
+        first, last = first[~single], last[~single]
+        sp, ep = sp[~single], ep[~single]
+        values += np.bincount(
+            first, weights=(first + 1) * window - sp, minlength=win_cnt
+        )
+        values += np.bincount(last, weights=ep - last * window, minlength=win_cnt)
+        diff = np.bincount(first + 1, minlength=win_cnt + 1)
+        diff -= np.bincount(last, minlength=win_cnt + 1)
+        values += np.cumsum(diff[:win_cnt]) * window
+        win_len = np.full(win_cnt, window, dtype=np.float64)
+        win_len[-1] = chr_len - (win_cnt - 1) * window
+        values /= win_len
+
+    win_sp = np.arange(win_cnt, dtype=np.int64) * window + 1
+    win_ep = np.minimum(win_sp + window - 1, chr_len)
+    return win_sp, win_ep, values.astype(np.float32)
+
+
+def feature_density(
+        features: Union[list, _IntervalIndex],
+        chr_len_db: dict,
+        window: int = 100000,
+        mode: str = "count",
+        processes: int = None,
+):
+    """
+    Compute feature density in windows of each chromosome with a process pool, chromosomes are spread across
+    processes, and run in current process if processes is 1,
+    mode could be "count" (features overlapping with each window) or "coverage" (fraction of bases covered,
+    overlapping features are counted repeatedly)
+    return interval index which could be used as numeric inner_data or outer_data of chromosome
+    """
+    if mode not in {"count", "coverage"}:
+        raise ValueError('mode must be "count" or "coverage"')
+    if window <= 0:
+        raise ValueError("window must larger than 0")
+    features = interval_index(features)
+    chr_names = list(chr_len_db)
+    jobs = []
+    for chrn in chr_names:
+        if chrn in features:
+            sp, ep, _ = features.get(chrn)
+        else:
+            sp, ep = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        jobs.append((sp, ep, int(chr_len_db[chrn]), window, mode))
+
+    if processes == 1:
+        results = list(map(_window_density, jobs))
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            results = list(executor.map(_window_density, jobs))
+    return _IntervalIndex(
+        {
+            chrn: (win_sp, win_ep, [values])
+            for chrn, (win_sp, win_ep, values) in zip(chr_names, results)
+        }
+    )
+
 
 class _Chromosome(object):
 
@@ -29,12 +440,16 @@ class _Chromosome(object):
             outer_line_color: any = None,
             outer_line_style: str = None,
             fig_ratio: float = None,
+            bin_size: Union[int, str] = None,
+            bin_reducer: str = "mean",
+            region: Union[tuple, list] = None,
+            outer_downsample: bool = False,
+            render: str = "scatter",
+            raster_dpi: float = None,
     ):
 
         self.__chr_len_db = chr_len_db
         self.__chr_order = chr_order
-        self.__inner_data = inner_data
-        self.__outer_data = outer_data
         self.__centro_db = centro_db
         self.__inner_value_type = inner_value_type.lower()
         self.__outer_value_type = outer_value_type.lower()
@@ -48,10 +463,18 @@ class _Chromosome(object):
             raise ValueError(
                 "value_type must in %s" % ",".join(list(self.__avail_inner_value_types))
             )
+        # sizes of markers in a list follow the records, they are kept as the 6th column in index
+        if self.__inner_value_type == "marker":
+            inner_data, inner_size = self.__attach_sizes(inner_data, inner_size)
+        if self.__outer_value_type == "marker":
+            outer_data, outer_size = self.__attach_sizes(outer_data, outer_size)
+        self.__inner_data = interval_index(inner_data) if inner_data else None
+        self.__outer_data = interval_index(outer_data) if outer_data else None
         self.__inner_size = inner_size
         self.__outer_size = outer_size
         self.__outer_line_color = outer_line_color
         self.__outer_line_style = outer_line_style
+        self.__outer_downsample = outer_downsample
         self.__fig_ratio = fig_ratio
         self.__inner_vmin = inner_vmin
         self.__inner_vmax = inner_vmax
@@ -63,18 +486,273 @@ class _Chromosome(object):
 
         self.__cmap_parts = cmap_parts
         self.__orientation = orientation
+        if isinstance(bin_size, str) and bin_size != "pixel":
+            raise ValueError('bin_size must be "pixel" or a number')
+        self.__bin_size = bin_size
+        self.__avail_bin_reducers = {"mean", "max", "sum", "count"}
+        if bin_reducer not in self.__avail_bin_reducers:
+            raise ValueError(
+                "bin_reducer must in %s" % ",".join(list(self.__avail_bin_reducers))
+            )
+        self.__bin_reducer = bin_reducer
+        # region could be one (chrn, sp, ep) or a list of them
+        if region is not None and len(region) > 0 and isinstance(region[0], str):
+            region = [region]
+        if region:
+            for chrn, sp, ep in region:
+                if chrn not in chr_len_db:
+                    raise ValueError("Chromosome %s in region not found" % chrn)
+                if sp >= ep:
+                    raise ValueError("Start of region must smaller than end")
+        self.__region = region
+        if render not in {"scatter", "raster"}:
+            raise ValueError('render must be "scatter" or "raster"')
+        self.__render = render
+        self.__raster_dpi = raster_dpi
+
+    # unit quarter arcs, shape: (4, points, 2), pos: 0~3, means top_right, top_left, buttom_left, buttom_right
+    __unit_arcs = None
+
+    @classmethod
+    def __get_unit_arcs(cls):
+        if cls.__unit_arcs is None:
+            theta = np.arange(0, np.pi / 2.0, 0.01)[None, :] + np.arange(4)[:, None] * np.pi / 2.0
+            cls.__unit_arcs = np.stack([np.cos(theta), np.sin(theta)], axis=-1)
+        return cls.__unit_arcs
+
+    @classmethod
+    def __generate_arcs(cls, r, cx, cy, pos, ratio):
+        """
+        Generate arcs with arrays of centers (cx, cy) and positions
+        return array with shape: (arc count, points, 2)
+        """
+        arcs = cls.__get_unit_arcs()[pos] * r
+        arcs[:, :, 1] *= ratio
+        arcs[:, :, 0] += np.asarray(cx, dtype=np.float64)[:, None]
+        arcs[:, :, 1] += np.asarray(cy, dtype=np.float64)[:, None]
+        return arcs
+
+    def __outline_segments(self, chr_names, fold, ratio):
+        """
+        Generate all arcs and side lines of chromosomes
+        return list of vertices arrays which could be used by LineCollection
+        """
+        r = 0.35
+        chr_cnt = len(chr_names)
+        x = np.arange(chr_cnt) * fold
+        height = np.array([self.__chr_len_db[_] for _ in chr_names], dtype=np.float64)
+        centro = np.full(chr_cnt, np.nan)
+        if self.__centro_db:
+            centro = np.array(
+                [self.__centro_db.get(_, np.nan) for _ in chr_names], dtype=np.float64
+            )
+        has_centro = ~np.isnan(centro)
+
+        # two end arcs of all chromosomes, and arcs near centromeres
+        pos = np.array([2, 3, 0, 1])
+        cx = np.repeat(x, 4)
+        cy = np.column_stack(
+            [np.full(chr_cnt, r * ratio)] * 2 + [height - r * ratio] * 2
+        ).reshape(-1)
+        arc_pos = np.tile(pos, chr_cnt)
+        cx = np.concatenate([cx, np.repeat(x[has_centro], 4)])
+        cy = np.concatenate(
+            [
+                cy,
+                np.column_stack(
+                    [centro[has_centro] + r * ratio] * 2
+                    + [centro[has_centro] - r * ratio] * 2
+                ).reshape(-1),
+            ]
+        )
+        arc_pos = np.concatenate([arc_pos, np.tile(pos, has_centro.sum())])
+        arcs = self.__generate_arcs(r, cx, cy, arc_pos, ratio)
+
+        # side lines, split by centromeres
+        line_x = np.concatenate([x - r, x + r])
+        line_sp = np.tile(np.full(chr_cnt, r * ratio), 2)
+        line_ep = np.tile(np.where(has_centro, centro - r * ratio, height - r * ratio), 2)
+        line_x = np.concatenate([line_x, x[has_centro] - r, x[has_centro] + r])
+        line_sp = np.concatenate([line_sp, np.tile(centro[has_centro] + r * ratio, 2)])
+        line_ep = np.concatenate([line_ep, np.tile(height[has_centro] - r * ratio, 2)])
+        lines = np.empty((len(line_x), 2, 2))
+        lines[:, :, 0] = line_x[:, None]
+        lines[:, 0, 1] = line_sp
+        lines[:, 1, 1] = line_ep
+
+        if self.__orientation == "horizontal":
+            arcs = arcs[:, :, ::-1]
+            lines = lines[:, :, ::-1]
+        return list(arcs) + list(lines)
+
+    def __to_columns(self, data):
+        """
+        Get arrays of columns from interval index, only intervals overlapping with regions are kept
+        """
+        chr_names, sp, ep, cols = data.columns(self.__region)
+        return chr_names, sp.astype(np.float64), ep.astype(np.float64), cols
 
-    # pos: 0~3, means top_right, top_left, buttom_left, buttom_right
     @staticmethod
-    def __generate_arc(r, c, pos, ratio):
-        x = []
-        y = []
-        theta = pos * np.pi / 2.0
-        while theta <= (pos + 1) * np.pi / 2.0:
-            x.append(r * np.cos(theta) + c[0])
-            y.append(r * np.sin(theta) * ratio + c[1])
-            theta += 0.01
-        return x, y
+    def __attach_sizes(data, sizes):
+        if not data or sizes is None or np.ndim(sizes) == 0:
+            return data, sizes
+        if isinstance(data, _IntervalIndex):
+            raise ValueError(
+                "sizes of markers should be the 6th column of records for interval index"
+            )
+        if len(sizes) != len(data):
+            raise ValueError("Count of sizes must same with count of records")
+        return [list(_[:5]) + [size] for _, size in zip(data, sizes)], None
+
+    def __plot_markers(self, ax, x, y, cols, size):
+        """
+        Plot markers with one scatter for each marker, cols are markers, colors, and optional sizes
+        """
+        markers, colors = cols[0], cols[1]
+        sizes = cols[2].astype(np.float64) if len(cols) > 2 else size
+        if self.__render == "raster":
+            self.__raster_markers(ax, x, y, colors, sizes)
+            return
+        marker_db = {}
+        marker_idx = np.array([marker_db.setdefault(_, len(marker_db)) for _ in markers])
+        colors = mpl.colors.to_rgba_array(colors)
+        for marker, idx in marker_db.items():
+            mask = marker_idx == idx
+            kws = {}
+            if sizes is not None:
+                kws["s"] = sizes[mask] if np.ndim(sizes) else sizes
+            plt.scatter(x[mask], y[mask], color=colors[mask], marker=marker, **kws)
+
+    def __raster_markers(self, ax, x, y, colors, sizes):
+        """
+        Accumulate markers to a RGBA image with size of axes in pixels with the same disc stamps of raster mode of
+        manhattan, and draw it with a single imshow, every color is a layer, markers are stamped as discs with
+        diameter of sqrt(size) points whatever the marker is, and the image covers current limits of axes
+        """
+        ax.autoscale_view()
+        xlim = ax.get_xlim()
+        ylim = ax.get_ylim()
+        # limits of image are sorted, and inverted axes are kept by setting limits back
+        img_xlim = tuple(sorted(xlim))
+        img_ylim = tuple(sorted(ylim))
+        fig = ax.figure
+        dpi = self.__raster_dpi if self.__raster_dpi else fig.dpi
+        bbox = ax.get_window_extent()
+        width = max(int(np.ceil(bbox.width * dpi / fig.dpi)), 1)
+        height = max(int(np.ceil(bbox.height * dpi / fig.dpi)), 1)
+
+        layer_colors, layer_idx = np.unique(
+            mpl.colors.to_rgba_array(colors), axis=0, return_inverse=True
+        )
+        layer_idx = layer_idx.reshape(-1)
+        if sizes is None:
+            sizes = mpl.rcParams["lines.markersize"] ** 2
+        sizes = np.broadcast_to(np.asarray(sizes, dtype=np.float64), len(x))
+        counts = np.zeros(len(layer_colors) * width * height, dtype=np.int64)
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        # discs of same size are stamped together
+        for size in np.unique(sizes):
+            mask = sizes == size
+            dx, dy = _disc_offsets(size, dpi)
+            _stamp_counts(
+                counts, x[mask], y[mask], layer_idx[mask], img_xlim, img_ylim, width, height, dx, dy
+            )
+        img = _composite(counts, layer_colors, 1.0, width, height)
+        ax.imshow(
+            img,
+            extent=img_xlim + img_ylim,
+            origin="lower",
+            aspect="auto",
+            interpolation="nearest",
+        )
+        ax.set(xlim=xlim, ylim=ylim)
+
+    def __bin_intervals(self, chr_names, sp, ep, values, bin_size):
+        """
+        Aggregate values of intervals in each bin of each chromosome with the reducer,
+        intervals are assigned to bins by their middle positions
+        """
+        names, codes = np.unique(chr_names, return_inverse=True)
+        bins = ((sp + ep) / 2.0 // bin_size).astype(np.int64)
+        key = codes * (bins.max() + 1) + bins
+        uniq_key, inv = np.unique(key, return_inverse=True)
+        if self.__bin_reducer == "count":
+            reduced = np.bincount(inv).astype(np.float64)
+        elif self.__bin_reducer == "sum":
+            reduced = np.bincount(inv, weights=values)
+        elif self.__bin_reducer == "mean":
+            reduced = np.bincount(inv, weights=values) / np.bincount(inv)
+        else:
+            reduced = np.full(len(uniq_key), -np.inf)
+            np.maximum.at(reduced, inv, values)
+
+        bin_codes, bins = np.divmod(uniq_key, bins.max() + 1)
+        chr_names = names[bin_codes]
+        chr_len = np.array([self.__chr_len_db[_] for _ in chr_names], dtype=np.float64)
+        sp = (bins * bin_size).astype(np.float64)
+        ep = np.minimum(sp + bin_size - 1, chr_len)
+        return chr_names, sp, ep, reduced
+
+    @staticmethod
+    def __minmax_downsample(chr_idx, pos, values, px_size):
+        """
+        Keep the first, last, minimum and maximum points of each pixel bucket,
+        points must be sorted by chromosome and position, return sorted indices of kept points
+        """
+        bucket = (pos // px_size).astype(np.int64)
+        key = chr_idx.astype(np.int64) * (bucket.max() + 1) + bucket
+        bounds = np.flatnonzero(np.diff(key)) + 1
+        first = np.concatenate([[0], bounds])
+        last = np.concatenate([bounds - 1, [len(key) - 1]])
+        # within each bucket, the order by values gives the minimum and maximum
+        by_value = np.lexsort((values, key))
+        keep = np.concatenate([first, last, by_value[first], by_value[last]])
+        return np.unique(keep)
+
+    def __plot_regions(self, ax, chr_names, sp, ep, colors, chr_idx_db, fold, ratio):
+        """
+        Plot regions of inner data as one PolyCollection, the width of each region is adjusted
+        if it locates at two ends or near centromeres
+        """
+        chr_len = np.array([self.__chr_len_db[_] for _ in chr_names], dtype=np.float64)
+        if self.__centro_db:
+            centro = np.array(
+                [self.__centro_db.get(_, np.nan) for _ in chr_names], dtype=np.float64
+            )
+        else:
+            centro = np.full(len(chr_names), np.nan)
+        chr_idx = np.array([chr_idx_db[_] for _ in chr_names])
+
+        mid = (sp + ep) / 2.0
+        dist = np.zeros(len(mid))
+        r = 0.35 * ratio
+
+        # if y locate at two ends or near centromeres, adjust width
+        near_start = mid <= r
+        near_end = ~near_start & (mid >= chr_len - r)
+        dist[near_start] = (r - mid[near_start]) / ratio
+        dist[near_end] = (mid[near_end] - (chr_len[near_end] - r)) / ratio
+        with np.errstate(invalid="ignore"):
+            before_centro = (centro - r <= sp) & (sp <= centro)
+            after_centro = ~before_centro & (centro <= ep) & (ep <= centro + r)
+        dist[before_centro] = (sp[before_centro] - centro[before_centro] + r) / ratio
+        dist[after_centro] = (centro[after_centro] + r - ep[after_centro]) / ratio
+
+        w = np.sqrt(0.1225 - dist ** 2) * 2
+        x = chr_idx * fold - w / 2.0
+        y = sp
+        h = ep - sp + 1
+        verts = np.empty((len(x), 4, 2))
+        verts[:, 0] = np.column_stack([x, y])
+        verts[:, 1] = np.column_stack([x + w, y])
+        verts[:, 2] = np.column_stack([x + w, y + h])
+        verts[:, 3] = np.column_stack([x, y + h])
+        if self.__orientation == "horizontal":
+            verts = verts[:, :, ::-1]
+        ax.add_collection(
+            PolyCollection(verts, facecolors=colors, edgecolors="none")
+        )
 
     def plot(self, ax, fig, kwargs):
         if self.__orientation != "vertical" and self.__orientation != "horizontal":
@@ -85,12 +763,17 @@ class _Chromosome(object):
         for i in ax.spines:
             ax.spines[i].set_visible(False)
         ax.tick_params("both", length=0)
-        chr_list = sorted(self.__chr_len_db)
-        chr_cnt = len(chr_list)
-        max_height = 0
-        for _ in self.__chr_len_db:
-            if max_height < self.__chr_len_db[_]:
-                max_height = self.__chr_len_db[_]
+        if self.__region:
+            # only chromosomes in regions are plotted, in the order of regions
+            chr_names = list(dict.fromkeys(_[0] for _ in self.__region))
+            view_sp = min(_[1] for _ in self.__region)
+            view_ep = max(_[2] for _ in self.__region)
+        else:
+            chr_names = self.__chr_order if self.__chr_order else sorted(self.__chr_len_db)
+            view_sp = 0
+            view_ep = max(self.__chr_len_db.values())
+        chr_cnt = len(chr_names)
+        max_height = view_ep - view_sp
 
         # Plot chromosomes
         if not self.__fig_ratio:
@@ -102,124 +785,42 @@ class _Chromosome(object):
         ratio = max_height * 1.0 / chr_cnt * self.__fig_ratio
 
         fold = 1 if not self.__outer_data else 2
-        for i in range(chr_cnt):
-            if self.__chr_order:
-                chrn = self.__chr_order[i]
-            else:
-                chrn = chr_list[i]
-
-            # Draw inner data
-            x = i * fold
-            r = 0.35
 
-            height = self.__chr_len_db[chrn]
-
-            # Draw two end arc
-            for j in [2, 3]:
-                arc_x, arc_y = self.__generate_arc(r, [x, r * ratio], j, ratio)
-                if self.__orientation == "horizontal":
-                    arc_x, arc_y = arc_y, arc_x
-                plt.plot(arc_x, arc_y, **kwargs)
-            for j in [0, 1]:
-                arc_x, arc_y = self.__generate_arc(r, [x, height - r * ratio], j, ratio)
-                if self.__orientation == "horizontal":
-                    arc_x, arc_y = arc_y, arc_x
-                plt.plot(arc_x, arc_y, **kwargs)
-
-            if self.__centro_db and chrn in self.__centro_db:
-                # if centromere found, draw it
-                x_start = x - 0.35
-                x_end = x - 0.35
-                y_start = r * ratio
-                y_end = self.__centro_db[chrn] - r * ratio
-                if self.__orientation == "horizontal":
-                    x_start, y_start = y_start, x_start
-                    x_end, y_end = y_end, x_end
-                plt.plot([x_start, x_end], [y_start, y_end], **kwargs)
-
-                x_start = x - 0.35
-                x_end = x - 0.35
-                y_start = self.__centro_db[chrn] + r * ratio
-                y_end = height - r * ratio
-                if self.__orientation == "horizontal":
-                    x_start, y_start = y_start, x_start
-                    x_end, y_end = y_end, x_end
-                plt.plot([x_start, x_end], [y_start, y_end], **kwargs)
-
-                x_start = x + 0.35
-                x_end = x + 0.35
-                y_start = r * ratio
-                y_end = self.__centro_db[chrn] - r * ratio
-                if self.__orientation == "horizontal":
-                    x_start, y_start = y_start, x_start
-                    x_end, y_end = y_end, x_end
-                plt.plot([x_start, x_end], [y_start, y_end], **kwargs)
-
-                x_start = x + 0.35
-                x_end = x + 0.35
-                y_start = self.__centro_db[chrn] + r * ratio
-                y_end = height - r * ratio
-                if self.__orientation == "horizontal":
-                    x_start, y_start = y_start, x_start
-                    x_end, y_end = y_end, x_end
-                plt.plot([x_start, x_end], [y_start, y_end], **kwargs)
-
-                for j in [2, 3]:
-                    arc_x, arc_y = self.__generate_arc(
-                        r, [x, self.__centro_db[chrn] + r * ratio], j, ratio
-                    )
-                    if self.__orientation == "horizontal":
-                        arc_x, arc_y = arc_y, arc_x
-                    plt.plot(arc_x, arc_y, **kwargs)
-                for j in [0, 1]:
-                    arc_x, arc_y = self.__generate_arc(
-                        r, [x, self.__centro_db[chrn] - r * ratio], j, ratio
-                    )
-                    if self.__orientation == "horizontal":
-                        arc_x, arc_y = arc_y, arc_x
-                    plt.plot(arc_x, arc_y, **kwargs)
-            else:
-                x_start = x - 0.35
-                x_end = x - 0.35
-                y_start = r * ratio
-                y_end = height - r * ratio
-                if self.__orientation == "horizontal":
-                    x_start, y_start = y_start, x_start
-                    x_end, y_end = y_end, x_end
-                plt.plot([x_start, x_end], [y_start, y_end], **kwargs)
-
-                x_start = x + 0.35
-                x_end = x + 0.35
-                y_start = r * ratio
-                y_end = height - r * ratio
-                if self.__orientation == "horizontal":
-                    x_start, y_start = y_start, x_start
-                    x_end, y_end = y_end, x_end
-                plt.plot([x_start, x_end], [y_start, y_end], **kwargs)
-
-        # set default color
-        if not kwargs.get("color") and not kwargs.get("c"):
-            for line in ax.get_lines():
-                line.set_color("black")
+        # all outlines of chromosomes are drawn as one LineCollection, with default color black
+        line_kwargs = dict(kwargs)
+        if "c" in line_kwargs:
+            line_kwargs["color"] = line_kwargs.pop("c")
+        if not line_kwargs.get("color"):
+            line_kwargs["color"] = "black"
+        # keep same cap and join styles with lines drawn by plt.plot
+        line_kwargs.setdefault("capstyle", mpl.rcParams["lines.solid_capstyle"])
+        line_kwargs.setdefault("joinstyle", mpl.rcParams["lines.solid_joinstyle"])
+        ax.add_collection(
+            LineCollection(self.__outline_segments(chr_names, fold, ratio), **line_kwargs)
+        )
 
         xticks = []
         for i in range(chr_cnt):
             xticks.append(i * fold)
-        if self.__chr_order:
-            xlabels = self.__chr_order
-        else:
-            xlabels = chr_list
+        xlabels = chr_names
 
         yticks = []
         ylabels = []
-        # add label each Mb
-        for pos in range(0, int(max_height), int(1e6)):
-            yticks.append(pos)
-            ylabels.append("%.0fMb" % (pos / 1e6))
-        next_pos = round(max_height / 1e6) * 1e6
-        if next_pos > yticks[-1]:
-            yticks.append(next_pos)
-            ylabels.append("%.0fMb" % (next_pos / 1e6))
+        if self.__region:
+            # 2~20 labels in region
+            step = 10 ** np.floor(np.log10(max(max_height, 1) / 2.0))
+            for pos in np.arange(np.ceil(view_sp / step) * step, view_ep + 1, step):
+                yticks.append(pos)
+                ylabels.append("%gMb" % (pos / 1e6))
+        else:
+            # add label each Mb
+            for pos in range(0, int(max_height), int(1e6)):
+                yticks.append(pos)
+                ylabels.append("%.0fMb" % (pos / 1e6))
+            next_pos = round(max_height / 1e6) * 1e6
+            if next_pos > yticks[-1]:
+                yticks.append(next_pos)
+                ylabels.append("%.0fMb" % (next_pos / 1e6))
         if self.__orientation == "horizontal":
             xticks, yticks = yticks, xticks
             xlabels, ylabels = ylabels, xlabels
@@ -230,25 +831,47 @@ class _Chromosome(object):
 
         if self.__orientation == "vertical":
             plt.xlim(-0.5, chr_cnt * fold - 0.5)
+            if self.__region:
+                plt.ylim(view_sp, view_ep)
         else:
             plt.ylim(-0.5, chr_cnt * fold - 0.5)
+            if self.__region:
+                plt.xlim(view_sp, view_ep)
 
-        if self.__chr_order:
-            chr_idx_db = {self.__chr_order[_]: _ for _ in range(chr_cnt)}
-        else:
-            chr_idx_db = {chr_list[_]: _ for _ in range(chr_cnt)}
+        chr_idx_db = {chr_names[_]: _ for _ in range(chr_cnt)}
 
-        mapper = None
+        # length of one pixel along chromosomes
+        bbox = ax.get_window_extent()
+        axis_px = bbox.height if self.__orientation == "vertical" else bbox.width
+        px_size = max_height / axis_px
+        bin_size = self.__bin_size
+        if bin_size == "pixel":
+            bin_size = max(int(np.ceil(px_size)), 1)
+
+        # intervals out of regions are skipped, tracks without intervals are not plotted
+        inner_columns = None
         if self.__inner_data:
+            inner_columns = self.__to_columns(self.__inner_data)
+            if len(inner_columns[1]) == 0:
+                inner_columns = None
+        outer_columns = None
+        if self.__outer_data:
+            outer_columns = self.__to_columns(self.__outer_data)
+            if len(outer_columns[1]) == 0:
+                outer_columns = None
+
+        mapper = None
+        if inner_columns:
             if self.__inner_value_type == "numeric":
+                chr_names, sp, ep, (values,) = inner_columns
+                values = values.astype(np.float64)
+                if bin_size:
+                    chr_names, sp, ep, values = self.__bin_intervals(
+                        chr_names, sp, ep, values, bin_size
+                    )
                 # Init colormap
-                max_val = None
-                min_val = None
-                for _, _, _, val in self.__inner_data:
-                    if not max_val or val > max_val:
-                        max_val = val
-                    if not min_val or val < min_val:
-                        min_val = val
+                min_val = values.min()
+                max_val = values.max()
                 if not np.isnan(self.__inner_vmin):
                     min_val = self.__inner_vmin
                 if not np.isnan(self.__inner_vmax):
@@ -256,169 +879,83 @@ class _Chromosome(object):
                 norm = mpl.colors.Normalize(vmin=min_val, vmax=max_val, clip=True)
                 mapper = mpl.cm.ScalarMappable(norm=norm, cmap=self.__cmap)
                 mapper.set_array(
-                    np.arange(
-                        min_val, max_val, (max_val - min_val) * 1.0 / self.__cmap_parts
-                    )
+                    np.linspace(min_val, max_val, self.__cmap_parts, endpoint=False)
                 )
 
                 # Plot regions
-                for chrn, sp, ep, val in self.__inner_data:
-                    y = sp
-                    mid = (sp + ep) / 2.0
-                    dist = 0
-
-                    # if y locate at two ends or near centromeres, adjust width
-                    if mid <= 0.35 * ratio:
-                        dist = (0.35 * ratio - mid) / ratio
-                    elif mid >= self.__chr_len_db[chrn] - 0.35 * ratio:
-                        dist = (mid - (self.__chr_len_db[chrn] - 0.35 * ratio)) / ratio
-
-                    if self.__centro_db and chrn in self.__centro_db:
-                        if (
-                                self.__centro_db[chrn] - 0.35 * ratio
-                                <= sp
-                                <= self.__centro_db[chrn]
-                        ):
-                            dist = (sp - self.__centro_db[chrn] + 0.35 * ratio) / ratio
-                        elif (
-                                self.__centro_db[chrn]
-                                <= ep
-                                <= self.__centro_db[chrn] + 0.35 * ratio
-                        ):
-                            dist = (self.__centro_db[chrn] + 0.35 * ratio - ep) / ratio
-
-                    w = np.sqrt(0.1225 - dist ** 2) * 2
-                    x = chr_idx_db[chrn] * fold - w / 2.0
-                    h = ep - sp + 1
-                    if self.__orientation == "horizontal":
-                        x, y = y, x
-                        w, h = h, w
-                    if val > max_val:
-                        val = max_val
-                    if val < min_val:
-                        val = min_val
-                    color = mapper.to_rgba(val)
-                    ax.add_patch(
-                        plt.Rectangle((x, y), w, h, facecolor=color, edgecolor="none")
-                    )
+                colors = mapper.to_rgba(np.clip(values, min_val, max_val))
+                self.__plot_regions(ax, chr_names, sp, ep, colors, chr_idx_db, fold, ratio)
 
             elif self.__inner_value_type == "color":
-                for chrn, sp, ep, color in self.__inner_data:
-                    y = sp
-                    mid = (sp + ep) / 2.0
-                    dist = 0
-
-                    # if y locate at two ends or near centromeres, adjust width
-                    if mid <= 0.35 * ratio:
-                        dist = (0.35 * ratio - mid) / ratio
-                    elif mid >= self.__chr_len_db[chrn] - 0.35 * ratio:
-                        dist = (mid - (self.__chr_len_db[chrn] - 0.35 * ratio)) / ratio
-
-                    if self.__centro_db and chrn in self.__centro_db:
-                        if (
-                                self.__centro_db[chrn] - 0.35 * ratio
-                                <= sp
-                                <= self.__centro_db[chrn]
-                        ):
-                            dist = (sp - self.__centro_db[chrn] + 0.35 * ratio) / ratio
-                        elif (
-                                self.__centro_db[chrn]
-                                <= ep
-                                <= self.__centro_db[chrn] + 0.35 * ratio
-                        ):
-                            dist = (self.__centro_db[chrn] + 0.35 * ratio - ep) / ratio
-
-                    w = np.sqrt(0.1225 - dist ** 2) * 2
-
-                    x = chr_idx_db[chrn] * fold - w / 2.0
-                    h = ep - sp + 1
-                    if self.__orientation == "horizontal":
-                        x, y = y, x
-                        w, h = h, w
-                    ax.add_patch(
-                        plt.Rectangle((x, y), w, h, facecolor=color, edgecolor="none")
-                    )
+                chr_names, sp, ep, (colors,) = inner_columns
+                colors = mpl.colors.to_rgba_array(colors)
+                self.__plot_regions(ax, chr_names, sp, ep, colors, chr_idx_db, fold, ratio)
             elif self.__inner_value_type == "marker":
-                for chrn, sp, ep, marker, color in self.__inner_data:
-                    x = chr_idx_db[chrn] * fold
-                    y = sp
-                    if self.__orientation == "horizontal":
-                        x, y = y, x
-                    if self.__inner_size:
-                        plt.scatter(x, y, s=self.__inner_size, color=color, marker=marker)
-                    else:
-                        plt.scatter(x, y, color=color, marker=marker)
+                chr_names, sp, ep, cols = inner_columns
+                x = np.array([chr_idx_db[_] for _ in chr_names]) * fold
+                y = sp
+                if self.__orientation == "horizontal":
+                    x, y = y, x
+                self.__plot_markers(ax, x, y, cols, self.__inner_size)
 
-        if self.__outer_data:
+        if outer_columns:
             if self.__outer_value_type == "numeric":
-                converted_data = {}
-                min_val = None
-                max_val = None
-                for chrn, sp, ep, val in self.__outer_data:
-                    if chrn not in converted_data:
-                        converted_data[chrn] = []
-                    x = val
-                    if min_val is None or x < min_val:
-                        min_val = x
-                    if max_val is None or x > max_val:
-                        max_val = x
-                    y = (sp + ep) / 2.0
-                    converted_data[chrn].append([x, y])
+                chr_names, sp, ep, (values,) = outer_columns
+                values = values.astype(np.float64)
+                if bin_size:
+                    chr_names, sp, ep, values = self.__bin_intervals(
+                        chr_names, sp, ep, values, bin_size
+                    )
                 if not np.isnan(self.__outer_vmin):
                     min_val = self.__outer_vmin
+                else:
+                    min_val = values.min()
                 if not np.isnan(self.__outer_vmax):
                     max_val = self.__outer_vmax
-                ratio = 0.7 / (max_val - min_val)
-                for chrn in converted_data:
-                    X = []
-                    Y = []
-                    offset = chr_idx_db[chrn] * fold + 0.65
-                    for x, y in sorted(converted_data[chrn], key=lambda _: _[1]):
-                        if x < min_val:
-                            X.append(min_val * ratio + offset)
-                        elif x > max_val:
-                            X.append(max_val * ratio + offset)
-                        else:
-                            X.append(x * ratio + offset)
-                        Y.append(y)
-                    if self.__orientation == "horizontal":
-                        X, Y = Y, X
-                    if self.__outer_size:
-                        plt.plot(
-                            X,
-                            Y,
-                            self.__outer_line_style if self.__outer_line_style else "-",
-                            color=(
-                                self.__outer_line_color
-                                if self.__outer_line_color
-                                else "blue"
-                            ),
-                            linewidth=self.__outer_size,
-                        )
-                    else:
-                        plt.plot(
-                            X,
-                            Y,
-                            self.__outer_line_style if self.__outer_line_style else "-",
-                            color=(
-                                self.__outer_line_color
-                                if self.__outer_line_color
-                                else "blue"
-                            ),
-                        )
+                else:
+                    max_val = values.max()
+                # all values are same, like the count of features
+                ratio = 0.7 / (max_val - min_val) if max_val > min_val else 0
+
+                # sort by chromosome and middle position
+                chr_idx = np.array([chr_idx_db[_] for _ in chr_names])
+                mid = (sp + ep) / 2.0
+                order = np.lexsort((mid, chr_idx))
+                chr_idx = chr_idx[order]
+                Y = mid[order]
+                X = np.clip(values[order], min_val, max_val)
+                if self.__outer_downsample:
+                    keep = self.__minmax_downsample(chr_idx, Y, X, px_size)
+                    chr_idx, X, Y = chr_idx[keep], X[keep], Y[keep]
+                X = X * ratio + chr_idx * fold + 0.65
+
+                # lines of chromosomes are split by nan, and plotted as one line
+                breaks = np.flatnonzero(np.diff(chr_idx)) + 1
+                X = np.insert(X, breaks, np.nan)
+                Y = np.insert(Y, breaks, np.nan)
+                if self.__orientation == "horizontal":
+                    X, Y = Y, X
+                line_kwargs = {
+                    "color": (
+                        self.__outer_line_color if self.__outer_line_color else "blue"
+                    )
+                }
+                if self.__outer_size:
+                    line_kwargs["linewidth"] = self.__outer_size
+                plt.plot(
+                    X,
+                    Y,
+                    self.__outer_line_style if self.__outer_line_style else "-",
+                    **line_kwargs
+                )
 
             elif self.__outer_value_type == "marker":
-                for chrn, sp, ep, marker, color in self.__outer_data:
-                    x = chr_idx_db[chrn] * fold + 1
-                    y = (sp + ep) / 2.0
-                    if self.__orientation == "horizontal":
-                        x, y = y, x
-                    if self.__outer_size:
-                        plt.scatter(
-                            x, y, s=self.__outer_size, color=color, marker=marker
-                        )
-                    else:
-                        plt.scatter(x, y, color=color, marker=marker)
+                chr_names, sp, ep, cols = outer_columns
+                x = np.array([chr_idx_db[_] for _ in chr_names]) * fold + 1
+                y = (sp + ep) / 2.0
+                if self.__orientation == "horizontal":
+                    x, y = y, x
+                self.__plot_markers(ax, x, y, cols, self.__outer_size)
         return mapper
 
 
@@ -442,6 +979,12 @@ def chromosome(
         outer_line_color: any = None,
         outer_line_style: str = None,
         fig_ratio: float = None,
+        bin_size: Union[int, str] = None,
+        bin_reducer: str = "mean",
+        region: Union[tuple, list] = None,
+        outer_downsample: bool = False,
+        render: str = "scatter",
+        raster_dpi: float = None,
         **kwargs
 ):
     plotter = _Chromosome(
@@ -464,6 +1007,12 @@ def chromosome(
         outer_line_color,
         outer_line_style,
         fig_ratio,
+        bin_size,
+        bin_reducer,
+        region,
+        outer_downsample,
+        render,
+        raster_dpi,
     )
 
     if not plt:
@@ -1,4 +1,39 @@
+import os
+import re
+
+import matplotlib as mpl
 import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+from matplotlib.collections import LineCollection, PolyCollection
+
+
+def _arrow_verts(sp, ep, forward, head_length, y=0., width=0.4, head_width=0.75):
+    '''
+    Vertices of gene arrows with same shape as ax.arrow with length_includes_head=True
+    return array with shape: (gene count, 8, 2)
+    '''
+    length = ep - sp + 1
+    hl = np.minimum(head_length, length)
+    # horizontal arrows point at (0, 0), from tip to bottom left, then back to tip
+    verts = np.empty((len(sp), 8, 2))
+    verts[:, :, 0] = -np.column_stack([np.zeros_like(hl), hl, hl, length, length, hl, hl, np.zeros_like(hl)])
+    verts[:, :, 1] = np.array([0, -head_width / 2., -width / 2., -width / 2., width / 2., width / 2.,
+                               head_width / 2., 0])
+    # arrows of reverse strand are rotated by 180 degrees
+    direction = np.where(forward, 1., -1.)
+    tip = np.where(forward, ep + 1., sp - 1.)
+    verts *= direction[:, None, None]
+    verts[:, :, 0] += tip[:, None]
+    verts[:, :, 1] += np.broadcast_to(np.asarray(y, dtype=np.float64), tip.shape)[:, None]
+    return verts
+
+
+def _to_rgba(colors, default):
+    '''
+    Convert list of colors to rgba array, None is replaced with default
+    '''
+    return mpl.colors.to_rgba_array([default if _ is None else _ for _ in colors])
 
 
 class _GeneCluster(object):
@@ -14,42 +49,141 @@ class _GeneCluster(object):
         self.__edgewidth = edgewidth
         self.__lw = lw
 
+    def _plot_arrows(self, ax, sp, ep, forward, colors, head_length, y=0.):
+        '''
+        Plot arrows of all genes as one PolyCollection, styles are same with patches of ax.arrow
+        '''
+        # edges of arrows are drawn with default edge color of patches if not set
+        if isinstance(self.__edgecolor, list):
+            edgecolors = _to_rgba(self.__edgecolor, mpl.rcParams['patch.edgecolor'])
+        elif self.__edgecolor:
+            edgecolors = self.__edgecolor
+        else:
+            edgecolors = mpl.rcParams['patch.edgecolor']
+        facecolors = _to_rgba(colors, mpl.rcParams['patch.facecolor'])
+
+        verts = _arrow_verts(sp, ep, forward, head_length, y)
+        ax.add_collection(PolyCollection(verts, facecolors=facecolors, edgecolors=edgecolors, zorder=99,
+                                         linewidths=self.__edgewidth, joinstyle='miter', capstyle='butt'))
+
     def plot(self, ax, fig):
         fig_w, fig_h = fig.get_size_inches() * fig.dpi
         ymax = fig_h * 10. / fig_w
-        xticks = []
-        xlabels = []
-        min_pos = None
-        max_pos = None
-        for gn, sp, ep, _, _ in self.__gene_list:
-            if not min_pos or sp < min_pos:
-                min_pos = sp
-            if not max_pos or ep > max_pos:
-                max_pos = ep
-
-            xticks.append((ep + sp) / 2.)
-            xlabels.append(gn)
-        for i in range(len(self.__gene_list)):
-            gn, sp, ep, direct, color = self.__gene_list[i]
-            if self.__edgecolor:
-                if isinstance(self.__edgecolor, list):
-                    edgecolor = self.__edgecolor[i]
-                else:
-                    edgecolor = self.__edgecolor
-            else:
-                edgecolor = None
-            if direct == '+':
-                ax.arrow(sp, 0, ep - sp + 1, 0, length_includes_head=True, head_length=min(max_pos / 50., ep - sp + 1),
-                         width=0.4, head_width=0.75, facecolor=color, edgecolor=edgecolor,
-                         zorder=99, lw=self.__edgewidth)
-            else:
-                ax.arrow(ep, 0, -(ep - sp + 1), 0, length_includes_head=True,
-                         head_length=min(max_pos / 50., ep - sp + 1), width=0.4, head_width=0.75, facecolor=color,
-                         edgecolor=edgecolor, zorder=99, lw=self.__edgewidth)
+        gene_names = [_[0] for _ in self.__gene_list]
+        sp = np.array([_[1] for _ in self.__gene_list], dtype=np.float64)
+        ep = np.array([_[2] for _ in self.__gene_list], dtype=np.float64)
+        forward = np.array([_[3] == '+' for _ in self.__gene_list])
+        min_pos = sp.min()
+        max_pos = ep.max()
+        xticks = (ep + sp) / 2.
+
+        self._plot_arrows(ax, sp, ep, forward, [_[4] for _ in self.__gene_list], max_pos / 50.)
         ax.plot([min_pos, max_pos], [0, 0], color='lightgrey', lw=self.__lw, zorder=1)
         ax.set_ylim(-.5, max(.5, ymax - .5))
         ax.set_yticks([])
-        ax.set_xticks(xticks, xlabels, rotation=-45, ha='center')
+        ax.set_xticks(xticks, gene_names, rotation=-45, ha='center')
+        for i in ax.spines:
+            ax.spines[i].set_visible(False)
+        ax.tick_params('both', length=0)
+
+
+class _GeneClusterStack(_GeneCluster):
+    '''
+    Gene clusters of many loci stacked in rows from top to bottom, with ribbons between homologous genes
+    '''
+
+    def __init__(self,
+                 loci: list,
+                 links: list = None,
+                 labels: list = None,
+                 row_gap: float = 2.,
+                 edgecolor: any = None,
+                 edgewidth: int = 1,
+                 lw: int = 3,
+                 link_color: any = 'lightgrey',
+                 link_alpha: float = .6):
+        super().__init__([_ for locus in loci for _ in locus], edgecolor, edgewidth, lw)
+        if labels is not None and len(labels) != len(loci):
+            raise ValueError("Count of labels must be same with loci")
+        self.__loci = loci
+        self.__links = links
+        self.__labels = labels
+        self.__row_gap = row_gap
+        self.__lw = lw
+        self.__link_color = link_color
+        self.__link_alpha = link_alpha
+
+    def __link_verts(self, links, sp, ep, forward, y):
+        '''
+        Ribbons between edges of linked genes which face each other,
+        ribbons are twisted if linked genes locate on different strands
+        return vertices array with shape: (link count, 4, 2), and colors of links
+        '''
+        gene_idx_db = {}
+        # genes with same name in one row could not be linked by name
+        ambiguous = set()
+        row_idx = [i for i, locus in enumerate(self.__loci) for _ in locus]
+        genes = [gn for locus in self.__loci for gn in locus]
+        for idx, gn in enumerate(genes):
+            key = (row_idx[idx], gn[0])
+            if key in gene_idx_db:
+                ambiguous.add(key)
+            gene_idx_db[key] = idx
+        for link in links:
+            for key in [(link[0], link[1]), (link[2], link[3])]:
+                if key in ambiguous:
+                    raise ValueError("Gene %s of link is not unique in row %s" % (key[1], key[0]))
+        try:
+            a = np.array([gene_idx_db[(_[0], _[1])] for _ in links], dtype=np.int64)
+            b = np.array([gene_idx_db[(_[2], _[3])] for _ in links], dtype=np.int64)
+        except KeyError as e:
+            raise ValueError("Gene %s of link not found in row %s" % (e.args[0][1], e.args[0][0]))
+        colors = [_[4] if len(_) > 4 else self.__link_color for _ in links]
+
+        # edge of gene a faces gene b
+        side = np.where(y[a] > y[b], -1., 1.) * .375
+        b_sp = np.where(forward[a] == forward[b], sp[b], ep[b])
+        b_ep = np.where(forward[a] == forward[b], ep[b], sp[b])
+        verts = np.empty((len(links), 4, 2))
+        verts[:, 0] = np.column_stack([sp[a], y[a] + side])
+        verts[:, 1] = np.column_stack([ep[a], y[a] + side])
+        verts[:, 2] = np.column_stack([b_ep, y[b] - side])
+        verts[:, 3] = np.column_stack([b_sp, y[b] - side])
+        return verts, colors
+
+    def plot(self, ax, fig):
+        row_cnt = len(self.__loci)
+        row_lens = np.array([len(_) for _ in self.__loci])
+        if row_cnt == 0 or row_lens.min() == 0:
+            raise ValueError("Each locus must contain at least one gene")
+        genes = [_ for locus in self.__loci for _ in locus]
+        row_idx = np.repeat(np.arange(row_cnt), row_lens)
+        sp = np.array([_[1] for _ in genes], dtype=np.float64)
+        ep = np.array([_[2] for _ in genes], dtype=np.float64)
+        forward = np.array([_[3] == '+' for _ in genes])
+
+        # all loci start from 0, rows are ordered from top to bottom
+        row_starts = np.concatenate([[0], np.cumsum(row_lens)[:-1]])
+        offsets = np.minimum.reduceat(sp, row_starts)
+        row_ends = np.maximum.reduceat(ep, row_starts) - offsets
+        sp -= offsets[row_idx]
+        ep -= offsets[row_idx]
+        row_y = -np.arange(row_cnt) * self.__row_gap
+        y = row_y[row_idx]
+
+        if self.__links:
+            verts, colors = self.__link_verts(self.__links, sp, ep, forward, y)
+            ax.add_collection(PolyCollection(verts, facecolors=_to_rgba(colors, self.__link_color),
+                                             edgecolors='none', alpha=self.__link_alpha, zorder=2))
+        self._plot_arrows(ax, sp, ep, forward, [_[4] for _ in genes], row_ends.max() / 50., y)
+        backbones = np.stack([np.column_stack([np.zeros(row_cnt), row_y]),
+                              np.column_stack([row_ends, row_y])], axis=1)
+        ax.add_collection(LineCollection(backbones, colors='lightgrey', linewidths=self.__lw, zorder=1,
+                                         capstyle=mpl.rcParams['lines.solid_capstyle']))
+
+        ax.set_xlim(-row_ends.max() / 50., row_ends.max() * 51. / 50.)
+        ax.set_ylim(row_y[-1] - self.__row_gap / 2., self.__row_gap / 2.)
+        ax.set_yticks(row_y, self.__labels if self.__labels else [''] * row_cnt)
         for i in ax.spines:
             ax.spines[i].set_visible(False)
         ax.tick_params('both', length=0)
@@ -69,3 +203,159 @@ def genecluster(gene_list: list,
     plotter.plot(ax, fig)
 
     return fig, ax
+
+
+def _parse_gff(gff_path, feature_type, name_attr, chunksize):
+    '''
+    Read features of GFF3 file (plain text or gzipped) chunk by chunk
+    return arrays of chromosome names, chromosome codes, starts, ends, strands and names, sorted by chromosome and start
+    '''
+    name_pattern = r'(?:^|;)\s*%s=([^;]*)' % re.escape(name_attr)
+    chrom_idx_db = {}
+    chrom_list = []
+    sp_list = []
+    ep_list = []
+    strand_list = []
+    name_list = []
+    # all 9 columns are named, since short lines of sequences after ##FASTA could not be read with usecols
+    reader = pd.read_csv(gff_path, sep='\t', header=None, names=range(9), dtype={0: str, 2: str, 6: str, 8: str},
+                         chunksize=chunksize, compression='infer', low_memory=False)
+    for chunk in reader:
+        # only lines start with "#" are comments, "#" could be used in attributes,
+        # and lines of sequences after ##FASTA have no feature type
+        chunk = chunk[chunk[2].isin(feature_type).to_numpy() & ~chunk[0].str.startswith('#', na=False).to_numpy()]
+        names = chunk[8].str.extract(name_pattern, expand=False)
+        if name_attr != 'ID':
+            names = names.fillna(chunk[8].str.extract(r'(?:^|;)\s*ID=([^;]*)', expand=False))
+        names = names.fillna(chunk[0] + ':' + chunk[3].astype(str) + '-' + chunk[4].astype(str))
+
+        codes, uniques = pd.factorize(chunk[0].to_numpy())
+        for chrn in uniques:
+            if chrn not in chrom_idx_db:
+                chrom_idx_db[chrn] = len(chrom_idx_db)
+        lut = np.array([chrom_idx_db[_] for _ in uniques], dtype=np.int32)
+        chrom_list.append(lut[codes] if len(lut) else np.empty(0, dtype=np.int32))
+        sp_list.append(chunk[3].to_numpy(dtype=np.int64))
+        ep_list.append(chunk[4].to_numpy(dtype=np.int64))
+        # strands and names are saved as bytes to keep the index compact
+        strand_list.append(chunk[6].fillna('.').str.encode('utf-8').to_numpy(dtype='S1'))
+        name_list.append(names.str.encode('utf-8').to_numpy(dtype=bytes))
+
+    if not chrom_list:
+        raise ValueError("No feature found in %s" % gff_path)
+    codes = np.concatenate(chrom_list)
+    sp = np.concatenate(sp_list)
+    order = np.lexsort((sp, codes))
+    return (np.array(list(chrom_idx_db), dtype=str), codes[order], sp[order], np.concatenate(ep_list)[order],
+            np.concatenate(strand_list)[order], np.concatenate(name_list)[order])
+
+
+class _GffIndex(object):
+    '''
+    Features sorted by chromosome and start, with running maximum of ends in each chromosome,
+    overlapping features of a region are found with binary search
+    '''
+
+    def __init__(self, table):
+        self.__chroms = table['chroms']
+        self.__sp = table['sp']
+        self.__ep = table['ep']
+        self.__max_ep = table['max_ep']
+        self.__strand = table['strand']
+        self.__names = table['names']
+        bounds = table['bounds']
+        self.__bounds_db = {self.__chroms[_]: (bounds[_], bounds[_ + 1]) for _ in range(len(self.__chroms))}
+
+    def __len__(self):
+        return len(self.__sp)
+
+    def chromosomes(self):
+        return list(self.__chroms)
+
+    def query(self, chrn, start, end, color='grey'):
+        '''
+        Features overlapping with [start, end] in chromosome chrn, color could be a str for all genes,
+        or a dict with gene names as keys, genes not in dict are grey
+        return gene list like [[gene name, start pos, end pos, direct(+/-), color], ...] which can be used by
+        genecluster directly
+        '''
+        if chrn not in self.__bounds_db:
+            return []
+        lo, hi = self.__bounds_db[chrn]
+        first = lo + np.searchsorted(self.__max_ep[lo:hi], start, side='left')
+        last = lo + np.searchsorted(self.__sp[lo:hi], end, side='right')
+        idx = np.arange(first, last)
+        idx = idx[self.__ep[first:last] >= start]
+        names = [_.decode('utf-8') for _ in self.__names[idx].tolist()]
+        if isinstance(color, dict):
+            colors = [color.get(_, 'grey') for _ in names]
+        else:
+            colors = [color] * len(names)
+        return [list(_) for _ in zip(names, self.__sp[idx].tolist(), self.__ep[idx].tolist(),
+                                     self.__strand[idx].astype('U1').tolist(), colors)]
+
+    def query_batch(self, regions, color='grey'):
+        '''
+        Query a list of regions like [(chrn, start, end), ...]
+        return list of gene lists
+        '''
+        return [self.query(chrn, start, end, color) for chrn, start, end in regions]
+
+
+def gff_index(gff_path: str,
+              index_path: str = None,
+              feature_type: any = 'gene',
+              name_attr: str = 'Name',
+              rebuild: bool = False,
+              chunksize: int = 1000000):
+    '''
+    Load the index of features in GFF3 file, the index is built and saved to index_path (default is
+    gff_path + ".gidx.npz") if not exists, or the GFF3 file, feature_type or name_attr is changed,
+    gene names are read from attribute name_attr, or ID if name_attr not found
+    return index which can be queried with regions for genecluster
+    '''
+    if index_path is None:
+        index_path = gff_path + '.gidx.npz'
+    if isinstance(feature_type, str):
+        feature_type = [feature_type]
+    stat = os.stat(gff_path)
+    src = np.array([gff_path, str(stat.st_size), str(stat.st_mtime_ns), ','.join(feature_type), name_attr])
+    if not rebuild and os.path.isfile(index_path):
+        with np.load(index_path) as npz:
+            if np.array_equal(npz['src'], src):
+                return _GffIndex({_: npz[_] for _ in npz.files})
+
+    chroms, codes, sp, ep, strand, names = _parse_gff(gff_path, feature_type, name_attr, chunksize)
+    bounds = np.searchsorted(codes, np.arange(len(chroms) + 1))
+    # running maximum restarts at each chromosome, as ends are shifted by chromosome codes
+    shift = codes.astype(np.int64) * (ep.max() + 1)
+    max_ep = np.maximum.accumulate(ep + shift) - shift
+    table = {'chroms': chroms, 'bounds': bounds, 'sp': sp, 'ep': ep, 'max_ep': max_ep, 'strand': strand,
+             'names': names}
+    # write to a temporary file first to avoid broken index if interrupted
+    tmp = index_path + '.tmp.npz'
+    np.savez(tmp, src=src, **table)
+    os.replace(tmp, index_path)
+    return _GffIndex(table)
+
+
+def genecluster_stack(loci: list,
+                      links: list = None,
+                      labels: list = None,
+                      row_gap: float = 2.,
+                      edgecolor: any = None,
+                      edgewidth: int = 1,
+                      lw: int = 3,
+                      link_color: any = 'lightgrey',
+                      link_alpha: float = .6,
+                      ax=None):
+    plotter = _GeneClusterStack(loci, links, labels, row_gap, edgecolor, edgewidth, lw, link_color, link_alpha)
+
+    if ax is None:
+        if not plt:
+            plt.figure()
+        ax = plt.gca()
+    fig = ax.figure
+    plotter.plot(ax, fig)
+
+    return fig, ax
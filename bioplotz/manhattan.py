@@ -1,53 +1,407 @@
+import hashlib
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib as mpl
 import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
+from matplotlib.collections import LineCollection
+from matplotlib.figure import Figure
+
+
+def _encode_chrom(chrom):
+    '''
+    Convert chromosome labels to integer codes, pd.Categorical is used directly
+    so that the labels of large inputs are never compared as strings
+    '''
+    if isinstance(chrom, pd.Series):
+        chrom = chrom.array
+    if isinstance(chrom, pd.Categorical):
+        codes = np.asarray(chrom.codes)
+        names = list(chrom.categories)
+        if len(codes) and codes.min() < 0:
+            raise ValueError("Chromosome codes must not contain missing values")
+        used = np.bincount(codes, minlength=len(names)) > 0
+        if not used.all():
+            codes = (np.cumsum(used) - 1)[codes]
+            names = [names[_] for _ in np.flatnonzero(used)]
+        return codes, names
+    codes, names = pd.factorize(np.asarray(chrom), sort=True)
+    if len(codes) and codes.min() < 0:
+        raise ValueError("Chromosome codes must not contain missing values")
+    return codes, list(names)
+
+
+def _load_columns(data, columns=None):
+    '''
+    Convert all supported inputs to parallel arrays
+    return chromosome codes (None for data without blocks), block names, positions and values
+    '''
+    if isinstance(data, dict):
+        names = sorted(data)
+        codes = np.repeat(np.arange(len(names)), [len(data[_][0]) for _ in names])
+        pos = np.concatenate([np.asarray(data[_][0]) for _ in names])
+        values = np.concatenate([np.asarray(data[_][1]) for _ in names])
+    elif isinstance(data, pd.DataFrame):
+        chrom_col, pos_col, value_col = columns if columns else ("chrom", "pos", "p")
+        codes, names = _encode_chrom(data[chrom_col])
+        pos = data[pos_col].to_numpy()
+        values = data[value_col].to_numpy()
+    elif isinstance(data, tuple) and len(data) == 3:
+        chrom, pos, values = data
+        codes, names = _encode_chrom(chrom)
+        pos = np.asarray(pos)
+        values = np.asarray(values)
+    elif isinstance(data, list) or isinstance(data, np.ndarray):
+        data = np.asarray(data)
+        codes = None
+        names = []
+        pos = data[:, 0]
+        values = data[:, 1]
+    else:
+        raise ValueError("Unsupported data type")
+
+    if len(pos) != len(values) or (codes is not None and len(codes) != len(pos)):
+        raise ValueError("Chromosomes, positions and values must have the same length")
+    if len(pos) == 0:
+        raise ValueError("Data must not be empty")
+    return codes, names, pos, values
+
+
+def read_sumstats(path, chrom_col='#CHROM', pos_col='POS', p_col='P', sep='\t', log10p=False, p_max=None,
+                  chunksize=1000000):
+    '''
+    Read chromosome, position and p-value columns of GWAS summary statistics (plain text or gzipped) chunk by chunk,
+    only points with p-value not greater than p_max are retained if p_max is set,
+    log10p should be True if the p-value column is -log10(p) already, like LOG10P of REGENIE
+    return a tuple of (pd.Categorical chromosomes, int32 positions, float32 -log10(p)) which can be used as
+    data of manhattan directly, chromosomes are ordered by their first appearance
+    '''
+    chrom_idx_db = {}
+    chrom_list = []
+    pos_list = []
+    value_list = []
+    min_value = None if p_max is None else -np.log10(p_max)
+    reader = pd.read_csv(path, sep=sep, usecols=[chrom_col, pos_col, p_col], dtype={chrom_col: str},
+                         chunksize=chunksize, compression='infer')
+    for chunk in reader:
+        values = chunk[p_col].to_numpy(dtype=np.float64)
+        if not log10p:
+            # p-value of 0 is kept as the smallest positive value
+            values = -np.log10(np.maximum(values, np.finfo(np.float64).tiny))
+        retain = ~np.isnan(values) & chunk[chrom_col].notna().to_numpy()
+        if min_value is not None:
+            retain &= values >= min_value
+        if not retain.all():
+            chunk = chunk[retain]
+            values = values[retain]
+
+        codes, uniques = pd.factorize(chunk[chrom_col].to_numpy())
+        for chrn in uniques:
+            if chrn not in chrom_idx_db:
+                chrom_idx_db[chrn] = len(chrom_idx_db)
+        lut = np.array([chrom_idx_db[_] for _ in uniques], dtype=np.int32)
+        chrom_list.append(lut[codes] if len(lut) else np.empty(0, dtype=np.int32))
+        pos_list.append(chunk[pos_col].to_numpy(dtype=np.int32))
+        value_list.append(values.astype(np.float32))
+
+    if not chrom_list:
+        raise ValueError("No data found in %s" % path)
+    chrom = pd.Categorical.from_codes(np.concatenate(chrom_list), categories=list(chrom_idx_db))
+    return chrom, np.concatenate(pos_list), np.concatenate(value_list)
+
+
+def _pixel_thin(x, y, xlim, ylim, width, height, groups=None):
+    '''
+    Keep the first point of each occupied cell of a width * height pixel grid (of each group if groups is set)
+    return sorted indices of kept points
+    '''
+    col = np.subtract(x, xlim[0], dtype=np.float64)
+    col *= width / max(xlim[1] - xlim[0], np.finfo(np.float64).tiny)
+    row = np.subtract(y, ylim[0], dtype=np.float64)
+    row *= height / max(ylim[1] - ylim[0], np.finfo(np.float64).tiny)
+    key = np.clip(col, 0, width).astype(np.int64)
+    key *= height + 1
+    key += np.clip(row, 0, height).astype(np.int64)
+    if groups is not None:
+        key += groups * ((width + 1) * (height + 1))
+    _, kept = np.unique(key, return_index=True)
+    kept.sort()
+    return kept
+
+
+def _disc_offsets(s, dpi):
+    '''
+    Offsets of pixels which intersect with a disc with diameter of sqrt(s) points, like size of markers in scatter
+    return offsets of columns and rows
+    '''
+    radius = max(np.sqrt(s) * dpi / 72. / 2., .5)
+    r = int(np.ceil(radius))
+    dx, dy = np.meshgrid(np.arange(-r, r + 1), np.arange(-r, r + 1))
+    stamp = np.maximum(np.abs(dx) - .5, 0) ** 2 + np.maximum(np.abs(dy) - .5, 0) ** 2 < radius ** 2
+    return dx[stamp], dy[stamp]
+
+
+def _stamp_counts(counts, x, y, layer_idx, xlim, ylim, width, height, dx, dy, chunk_size=1000000):
+    '''
+    Accumulate counts of points covering each pixel into counts in place, points are stamped with pixel offsets of
+    a disc, counts is a flat array of layers with size of width * height, and layer_idx is the layer of each point
+    (all points are in layer 0 if None)
+    '''
+    x0, x1 = xlim
+    y0, y1 = ylim
+    for sp in range(0, len(x), chunk_size):
+        ep = min(sp + chunk_size, len(x))
+        col = np.subtract(x[sp: ep], x0, dtype=np.float64)
+        col *= width / max(x1 - x0, np.finfo(np.float64).tiny)
+        col = np.floor(col).astype(np.int64)
+        row = np.subtract(y[sp: ep], y0, dtype=np.float64)
+        row *= height / max(y1 - y0, np.finfo(np.float64).tiny)
+        row = np.floor(row).astype(np.int64)
+        layer = 0 if layer_idx is None else layer_idx[sp: ep].astype(np.int64) * (width * height)
+        for ox, oy in zip(dx, dy):
+            c = col + ox
+            rw = row + oy
+            valid = (c >= 0) & (c < width) & (rw >= 0) & (rw < height)
+            pix = (rw * width + c + layer)[valid]
+            counts += np.bincount(pix, minlength=len(counts))
+
+
+def _composite(counts, rgba, alpha, width, height):
+    '''
+    Composite layers of counts with premultiplied alpha in order of layers, every point covering a pixel is blended
+    with alpha of its layer
+    return RGBA image with shape: (height, width, 4), rows are from bottom to top
+    '''
+    img = np.zeros((height * width, 4))
+    for i in range(len(rgba)):
+        cover = 1. - np.power(1. - alpha * rgba[i, 3], counts[i * width * height: (i + 1) * width * height])
+        img *= (1. - cover)[:, None]
+        img[:, :3] += cover[:, None] * rgba[i, :3]
+        img[:, 3] += cover
+    visible = img[:, 3] > 0
+    img[visible, :3] /= img[visible, 3][:, None]
+    return img.reshape(height, width, 4)
+
+
+def _preprocess(codes, names, pos, y, log_base, reverse, block_lens=None):
+    '''
+    Sort points by block only if needed, add cumulative block offsets to positions, and convert values with
+    log_base and reverse, if block_lens is set, the order and lengths of blocks are taken from it instead of data
+    return a dict of arrays which can be saved to cache directly
+    '''
+    order = None
+    if codes is not None and block_lens is not None:
+        block_idx_db = {name: i for i, name in enumerate(block_lens)}
+        missing = [_ for _ in names if _ not in block_idx_db]
+        if missing:
+            raise ValueError("Blocks not found in block_lens: %s" % ",".join(map(str, missing)))
+        codes = np.array([block_idx_db[_] for _ in names], dtype=np.int64)[codes]
+        names = list(block_lens)
+    if codes is None:
+        x = pos.astype(np.int64, copy=False)
+        bounds = np.array([0, len(x)])
+        block_ends = np.array([], dtype=np.int64)
+        x_ticks = np.array([])
+        x_max = x.max()
+    else:
+        if len(codes) > 1 and np.any(codes[1:] < codes[:-1]):
+            order = np.argsort(codes, kind='stable')
+            codes = codes[order]
+            pos = pos[order]
+            y = y[order]
+        bounds = np.searchsorted(codes, np.arange(len(names) + 1))
+        if block_lens is not None:
+            block_max = np.array([block_lens[_] for _ in names], dtype=np.int64)
+        else:
+            block_max = np.maximum.reduceat(pos, bounds[:-1]).astype(np.int64)
+        block_ends = np.cumsum(block_max)
+        offsets = block_ends - block_max
+        x = pos.astype(np.int64)
+        x += np.repeat(offsets, np.diff(bounds))
+        x_ticks = offsets + block_max / 2
+        x_max = block_ends[-1]
+
+    if log_base != 0:
+        y = np.log(y)
+        y /= np.log(log_base)
+        if reverse:
+            np.negative(y, out=y)
+    elif reverse:
+        y = np.negative(y)
+
+    names = np.asarray(names)
+    if names.dtype == object:
+        names = names.astype(str)
+    table = {'x': x, 'y': y, 'bounds': bounds, 'block_ends': block_ends, 'x_ticks': x_ticks, 'x_max': x_max,
+             'names': names}
+    # indices of points in data, only saved if points are sorted
+    if order is not None:
+        table['index'] = order
+    return table
+
+
+def _cache_key(codes, names, pos, values, log_base, reverse, block_lens=None):
+    '''
+    Hash of input content and parameters which affect preprocessed arrays
+    '''
+    h = hashlib.blake2b(digest_size=20)
+    block_lens = None if block_lens is None else list(block_lens.items())
+    h.update(repr((list(names), float(log_base), bool(reverse), block_lens)).encode())
+    for arr in (codes, pos, values):
+        if arr is None:
+            h.update(b'None')
+            continue
+        arr = np.ascontiguousarray(arr)
+        h.update(("%s%s" % (arr.dtype.str, arr.shape)).encode())
+        h.update(arr.view(np.uint8).reshape(-1))
+    return h.hexdigest()
+
+
+def _load_cache(cache, key, log_base, reverse):
+    '''
+    Load preprocessed arrays from cache, None is returned if cache not exists or was made with other data,
+    if key is None, the content of data is not checked, only log_base and reverse are checked
+    '''
+    if not os.path.isfile(cache):
+        return None
+    with np.load(cache) as npz:
+        if key is not None and str(npz['key']) != key:
+            return None
+        if key is None and (float(npz['log_base']) != log_base or bool(npz['reverse']) != reverse):
+            return None
+        return {_: npz[_] for _ in npz.files if _ not in {'key', 'log_base', 'reverse'}}
+
+
+def _save_cache(cache, key, log_base, reverse, table):
+    # write to a temporary file first to avoid broken cache if interrupted
+    tmp = cache + '.tmp.npz'
+    np.savez(tmp, key=np.array(key), log_base=np.array(float(log_base)), reverse=np.array(bool(reverse)), **table)
+    os.replace(tmp, cache)
+
+
+def _clump(x, y, bounds, k, window, min_value=None):
+    '''
+    Select at most k top points for each block greedily, points within window of a selected point are clumped
+    to it and could not be selected again, points lower than min_value are never selected, candidates are taken
+    from the most significant points with argpartition, and the candidate pool is enlarged only if a block runs
+    out of candidates
+    return indices of selected points, ordered by block and significance
+    '''
+    n = len(y)
+    block_cnt = len(bounds) - 1
+    pool_size = min(n, 64 * k * block_cnt)
+    while True:
+        if pool_size < n:
+            pool = np.argpartition(y, n - pool_size)[n - pool_size:]
+        else:
+            pool = np.arange(n)
+        blocks = np.searchsorted(bounds, pool, side='right') - 1
+        sort_idx = np.lexsort((x[pool], blocks))
+        pool = pool[sort_idx]
+        blocks = blocks[sort_idx]
+        px = x[pool]
+        py = y[pool].astype(np.float64)
+        py[np.isnan(py)] = -np.inf
+        # the pool contains all points which could be selected
+        complete = pool_size >= n
+        if min_value is not None:
+            complete |= py.min() < min_value
+            py[py < min_value] = -np.inf
+        pool_bounds = np.searchsorted(blocks, np.arange(block_cnt + 1))
+        pool_cnt = np.diff(pool_bounds)
+        nonempty = pool_cnt > 0
+
+        excluded = np.zeros(len(pool), dtype=bool)
+        selected = []
+        enough = True
+        for _ in range(k):
+            masked = np.where(excluded, -np.inf, py)
+            max_val = np.full(block_cnt, -np.inf)
+            if nonempty.any():
+                max_val[nonempty] = np.maximum.reduceat(masked, pool_bounds[:-1][nonempty])
+            found = max_val > -np.inf
+            # a block without candidates left may have more points out of the pool
+            if not complete and np.any(~found & (pool_cnt < np.diff(bounds))):
+                enough = False
+                break
+            if not found.any():
+                break
+            hit = np.flatnonzero((masked == np.repeat(max_val, pool_cnt)) & np.repeat(found, pool_cnt))
+            _, first = np.unique(blocks[hit], return_index=True)
+            sel = hit[first]
+            selected.append(sel)
+
+            # exclude points within window of selected points by a difference array
+            sel_blocks = blocks[sel]
+            lo = np.maximum(np.searchsorted(px, px[sel] - window, side='left'), pool_bounds[sel_blocks])
+            hi = np.minimum(np.searchsorted(px, px[sel] + window, side='right'), pool_bounds[sel_blocks + 1])
+            diff = np.zeros(len(pool) + 1, dtype=np.int64)
+            np.add.at(diff, lo, 1)
+            np.add.at(diff, hi, -1)
+            excluded |= np.cumsum(diff[:-1]) > 0
+        if enough:
+            break
+        pool_size = min(n, pool_size * 4)
+
+    if not selected:
+        return np.array([], dtype=np.int64)
+    # selected points of each round are more significant than which of later rounds
+    selected = np.concatenate(selected)
+    return pool[selected[np.argsort(blocks[selected], kind='stable')]]
 
 
 class _Manhattan(object):
     def __init__(self, data, threshold=0, color=None, threshold_line_color='blue', threshold_line_width=1,
-                 block_line_width=1, log_base=0, reverse=False, xtick_labels=True, ytick_labels=True):
+                 block_line_width=1, log_base=0, reverse=False, xtick_labels=True, ytick_labels=True,
+                 columns=None, render='scatter', decimate=None, decimate_dpi=None, raster_dpi=None, cache=None,
+                 top_hits=None, clump_window=500000, hit_threshold=None, block_lens=None):
         if color is None:
             color = ['orange', 'green']
         if log_base < 0:
             raise ValueError("log base must be greater than or equal to 0")
-        x_ticks = []
-        x_max = 0
-        tmp_y = []
         if not color:
             color = ['orange', 'green']
-        '''
-        Convert __data to pd.DataFrame
-        '''
-        if isinstance(data, dict):
-            columns = sorted(data)
-            data = pd.DataFrame(data, columns=columns)
-            for col in columns:
-                data[col][0] = np.add(data[col][0], x_max, dtype=np.int64)
-                x_ticks.append((max(data[col][0]) - x_max) / 2 + x_max)
-                x_max = max(data[col][0])
-                if log_base != 0:
-                    data[col][1] = np.log(data[col][1]) / np.log(log_base)
-                if reverse:
-                    data[col][1] = -data[col][1]
-                tmp_y.extend(data[col][1])
-        elif isinstance(data, list) or isinstance(data, np.ndarray):
-            columns = []
-            data = pd.DataFrame(data)
-            x_max = max(data[0])
-            if log_base != 0:
-                data[1] = np.log(data[1]) / np.log(log_base)
-            if reverse:
-                data[1] = -data[1]
-            tmp_y.extend(data[1])
+        if render not in {'scatter', 'collection', 'raster'}:
+            raise ValueError("render must be one of \"scatter\", \"collection\" and \"raster\"")
+
+        if data is None:
+            # render from cache only, without parsing data again
+            if not cache:
+                raise ValueError("data must be set if cache is not set")
+            table = _load_cache(cache, None, log_base, reverse)
+            if table is None:
+                raise ValueError("Cache %s not found or made with different log_base or reverse" % cache)
         else:
-            raise ValueError("Unsupported data type")
+            codes, columns, pos, y = _load_columns(data, columns)
+            table = None
+            if cache:
+                key = _cache_key(codes, columns, pos, y, log_base, reverse, block_lens)
+                table = _load_cache(cache, key, log_base, reverse)
+            if table is None:
+                table = _preprocess(codes, columns, pos, y, log_base, reverse, block_lens)
+                if cache:
+                    _save_cache(cache, key, log_base, reverse, table)
+        x = table['x']
+        y = table['y']
+        bounds = table['bounds']
+        block_ends = table['block_ends']
+        x_ticks = table['x_ticks'].tolist()
+        x_max = table['x_max'][()]
+        columns = table['names'].tolist()
+        index = table.get('index')
 
         if not isinstance(threshold, list):
             threshold = np.array([threshold])
         else:
             threshold = np.array(threshold)
 
-        if log_base != 0:
+        # threshold of 0 means no threshold line
+        show_threshold = not (len(threshold) == 1 and threshold[0] == 0)
+        if log_base != 0 and show_threshold:
             threshold = np.log(threshold) / np.log(log_base)
         if reverse:
             threshold = -threshold
@@ -55,11 +409,26 @@ class _Manhattan(object):
         if not isinstance(threshold_line_color, list):
             threshold_line_color = [threshold_line_color]
 
-        self.__data = data
+        # convert cutoff of decimation and top hits same as threshold
+        if decimate is not None:
+            if log_base != 0:
+                decimate = np.log(decimate) / np.log(log_base)
+            if reverse:
+                decimate = -decimate
+        if hit_threshold is not None:
+            if log_base != 0:
+                hit_threshold = np.log(hit_threshold) / np.log(log_base)
+            if reverse:
+                hit_threshold = -hit_threshold
+
+        self.__x = x
+        self.__y = y
+        self.__bounds = bounds
+        self.__block_ends = block_ends
         self.__xlim = (0, x_max)
         self.__xmax = x_max
-        y_min = min(tmp_y)
-        y_max = max(tmp_y)
+        y_min = y.min()
+        y_max = y.max()
         self.__ymin = y_min
         self.__ymax = y_max
         if y_max < 0:
@@ -71,14 +440,135 @@ class _Manhattan(object):
         self.__x_labels = columns
         self.__color = color
         self.__threshold = threshold
+        self.__show_threshold = show_threshold
         self.__threshold_line_color = threshold_line_color
         self.__threshold_line_width = threshold_line_width
         self.__block_line_width = block_line_width
         self.__xtick_labels = xtick_labels
         self.__ytick_labels = ytick_labels
+        self.__render = render
+        self.__decimate = decimate
+        self.__decimate_dpi = decimate_dpi
+        self.__raster_dpi = raster_dpi
+        self.__index = index
+        self.__top_hits = top_hits
+        self.__clump_window = clump_window
+        self.__hit_threshold = hit_threshold
+        # lower p and larger values without log are more significant, reverse only flips the plotted values,
+        # so larger plotted values are more significant for -log10(p) or values without log and reverse
+        self.__sig_sign = 1. if (log_base != 0) == reverse else -1.
+
+    def __decimate_points(self, ax):
+        '''
+        Keep all points more significant than the cutoff of decimation, and only keep one point for each occupied
+        pixel of each block for the others, which looks same at the target dpi
+        '''
+        x = self.__x
+        y = self.__y
+        bounds = self.__bounds
+        fig = ax.figure
+        dpi = self.__decimate_dpi if self.__decimate_dpi else fig.dpi
+        bbox = ax.get_window_extent()
+        width = max(int(np.ceil(bbox.width * dpi / fig.dpi)), 1)
+        height = max(int(np.ceil(bbox.height * dpi / fig.dpi)), 1)
+
+        significant = self.__sig_sign * y >= self.__sig_sign * self.__decimate
+        low = np.flatnonzero(~significant)
+        groups = np.searchsorted(bounds, low, side='right') - 1
+        kept = _pixel_thin(x[low], y[low], self.__xlim, self.__ylim, width, height, groups)
+        kept = np.concatenate([np.flatnonzero(significant), low[kept]])
+        kept.sort()
+        return x[kept], y[kept], np.searchsorted(kept, bounds), len(x) - len(kept)
+
+    def __plot_collection(self, ax, x, y, bounds, marker, s, kws):
+        '''
+        Plot points with one PathCollection per color instead of one per block, blocks are assigned
+        to colors by the same cycling rule with scatter mode, and all block lines are in one LineCollection
+        '''
+        block_cnt = len(self.__x_labels)
+        colors = self.__color if isinstance(self.__color, list) else [self.__color]
+        color_cnt = len(colors)
+        if color_cnt == 1:
+            ax.scatter(x, y, color=colors[0], marker=marker, s=s, **kws)
+        else:
+            point_color_idx = np.repeat(np.arange(block_cnt) % color_cnt, np.diff(bounds))
+            for i in range(min(color_cnt, block_cnt)):
+                idx = point_color_idx == i
+                ax.scatter(x[idx], y[idx], color=colors[i], marker=marker, s=s, **kws)
+        if color_cnt == 1:
+            self.__plot_block_lines(ax)
+
+    def __plot_top_hits(self, ax):
+        '''
+        Label top hits of each block with their positions
+        return indices of top hits in data
+        '''
+        # significance is compared on signed values, so that larger values are always more significant, hit_threshold
+        # is converted same as plotted values, so lower values without log are dropped even if reverse is set
+        min_value = None if self.__hit_threshold is None else self.__sig_sign * self.__hit_threshold
+        hits = _clump(self.__x, self.__sig_sign * self.__y, self.__bounds, self.__top_hits, self.__clump_window,
+                      min_value)
+        hit_x = self.__x[hits]
+        hit_y = self.__y[hits]
+        if self.__x_labels:
+            blocks = np.searchsorted(self.__bounds, hits, side='right') - 1
+            offsets = np.concatenate([[0], self.__block_ends[:-1]])
+            labels = ["%s:%d" % (self.__x_labels[b], pos) for b, pos in zip(blocks, hit_x - offsets[blocks])]
+        else:
+            labels = ["%d" % pos for pos in hit_x]
+        # labels are placed beyond points in the direction of significance
+        for x, y, label in zip(hit_x, hit_y, labels):
+            ax.annotate(label, (x, y), xytext=(0, 2 * self.__sig_sign), textcoords='offset points', ha='center',
+                        va='bottom' if self.__sig_sign > 0 else 'top', fontsize='x-small')
+        if self.__index is not None:
+            hits = self.__index[hits]
+        return hits
+
+    def __plot_block_lines(self, ax):
+        segments = np.empty((len(self.__block_ends), 2, 2))
+        segments[:, :, 0] = self.__block_ends[:, None]
+        segments[:, 0, 1] = self.__ymin
+        segments[:, 1, 1] = self.__ymax
+        ax.add_collection(LineCollection(segments, colors='lightgrey', linewidths=self.__block_line_width,
+                                         linestyles=':'), autolim=False)
+
+    def __plot_raster(self, ax, x, y, bounds, s, kws, chunk_size=1000000):
+        '''
+        Accumulate points to a RGBA image with size of axes in pixels, and draw it with a single imshow,
+        every color is a layer which counts points covering each pixel, points are stamped as discs with
+        diameter of sqrt(s) points, and layers are composited with alpha in order of colors
+        '''
+        fig = ax.figure
+        dpi = self.__raster_dpi if self.__raster_dpi else fig.dpi
+        bbox = ax.get_window_extent()
+        width = max(int(np.ceil(bbox.width * dpi / fig.dpi)), 1)
+        height = max(int(np.ceil(bbox.height * dpi / fig.dpi)), 1)
+        x0, x1 = self.__xlim
+        y0, y1 = self.__ylim
+        alpha = kws.get('alpha')
+        alpha = 1. if alpha is None else alpha
+
+        colors = self.__color if isinstance(self.__color, list) else [self.__color]
+        if not self.__x_labels:
+            colors = colors[:1]
+        color_cnt = len(colors)
+        point_color_idx = None
+        if color_cnt > 1:
+            block_cnt = len(bounds) - 1
+            point_color_idx = np.repeat((np.arange(block_cnt) % color_cnt).astype(np.int32), np.diff(bounds))
+
+        dx, dy = _disc_offsets(s, dpi)
+        counts = np.zeros(color_cnt * width * height, dtype=np.int64)
+        _stamp_counts(counts, x, y, point_color_idx, self.__xlim, self.__ylim, width, height, dx, dy, chunk_size)
+        img = _composite(counts, mpl.colors.to_rgba_array(colors), alpha, width, height)
+        ax.imshow(img, extent=(x0, x1, y0, y1), origin='lower', aspect='auto',
+                  interpolation='nearest', zorder=kws.get('zorder', 1))
+        ax.set(xlim=self.__xlim, ylim=self.__ylim)
+        if self.__x_labels and color_cnt == 1:
+            self.__plot_block_lines(ax)
 
     def plot(self, ax, marker, s, kws):
-        data = self.__data
+        stats = {}
         ax.set(xlim=self.__xlim)
 
         if len(self.__ylim) != 0:
@@ -93,34 +583,44 @@ class _Manhattan(object):
         if not self.__ytick_labels:
             ax.set_yticklabels([])
 
+        if self.__decimate is not None:
+            x, y, bounds, stats['dropped'] = self.__decimate_points(ax)
+        else:
+            x, y, bounds = self.__x, self.__y, self.__bounds
+
         # Plot scatter of values
-        if not self.__x_labels:
+        if self.__render == 'raster':
+            self.__plot_raster(ax, x, y, bounds, s, kws)
+        elif not self.__x_labels:
             if isinstance(self.__color, list):
                 color = self.__color[0]
             else:
                 color = self.__color
-            ax.scatter(data[0], data[1], color=color, marker=marker, s=s, **kws)
+            ax.scatter(x, y, color=color, marker=marker, s=s, **kws)
+        elif self.__render == 'collection':
+            self.__plot_collection(ax, x, y, bounds, marker, s, kws)
         else:
             if isinstance(self.__color, list):
                 color_cnt = len(self.__color)
                 for i in range(0, len(self.__x_labels)):
-                    col = self.__x_labels[i]
+                    sp, ep = bounds[i], bounds[i + 1]
                     color_idx = i % color_cnt
-                    ax.scatter(data[col][0], data[col][1], color=self.__color[color_idx], marker=marker, s=s, **kws)
+                    ax.scatter(x[sp: ep], y[sp: ep], color=self.__color[color_idx], marker=marker, s=s, **kws)
                     if color_cnt == 1:
-                        x = max(data[col][0])
-                        ax.plot([x, x], [self.__ymin, self.__ymax], color='lightgrey', lw=self.__block_line_width,
+                        bx = self.__block_ends[i]
+                        ax.plot([bx, bx], [self.__ymin, self.__ymax], color='lightgrey', lw=self.__block_line_width,
                                 linestyle=':')
             else:
-                for col in self.__x_labels:
-                    ax.scatter(data[col][0], data[col][1], color=self.__color, **kws)
-                    x = max(data[col][0])
-                    ax.plot([x, x], [self.__ymin, self.__ymax], color='lightgrey', lw=self.__block_line_width,
+                for i in range(0, len(self.__x_labels)):
+                    sp, ep = bounds[i], bounds[i + 1]
+                    ax.scatter(x[sp: ep], y[sp: ep], color=self.__color, marker=marker, s=s, **kws)
+                    bx = self.__block_ends[i]
+                    ax.plot([bx, bx], [self.__ymin, self.__ymax], color='lightgrey', lw=self.__block_line_width,
                             linestyle=':')
 
         ax.plot([0, self.__xmax], [0, 0], color='lightgrey', lw=self.__block_line_width)
         # Plot thresholds
-        if not (len(self.__threshold) == 1 and self.__threshold[0] == 0):
+        if self.__show_threshold:
             color_cnt = len(self.__threshold_line_color)
             for i in range(0, len(self.__threshold)):
                 th = self.__threshold[i]
@@ -138,21 +638,136 @@ class _Manhattan(object):
         ax.spines['right'].set_linewidth(0.5)
         ax.spines['right'].set_color('lightgrey')
 
+        if self.__top_hits:
+            stats['top_hits'] = self.__plot_top_hits(ax)
+
+        return stats
+
 
 def manhattan(data, threshold=0, color=None,
               threshold_line_color='blue', threshold_line_width=1,
               block_line_width=1, log_base=0, reverse=False,
               xtick_labels=True, ytick_labels=True, ax=None, marker='.',
-              s=1, **kwargs):
+              s=1, columns=None, render='scatter', decimate=None, decimate_dpi=None, raster_dpi=None, cache=None,
+              top_hits=None, clump_window=500000, hit_threshold=None, block_lens=None, **kwargs):
     if color is None:
         color = ['orange', 'green']
     plotter = _Manhattan(data, threshold, color, threshold_line_color, threshold_line_width, block_line_width,
-                         log_base, reverse, xtick_labels, ytick_labels)
+                         log_base, reverse, xtick_labels, ytick_labels, columns, render, decimate, decimate_dpi,
+                         raster_dpi, cache, top_hits, clump_window, hit_threshold, block_lens)
 
-    if not plt:
-        plt.figure()
-    fig = plt.gcf()
-    ax = plt.gca()
-    plotter.plot(ax, marker, s, kwargs)
+    if ax is None:
+        if not plt:
+            plt.figure()
+        ax = plt.gca()
+    fig = ax.figure
+    stats = plotter.plot(ax, marker, s, kwargs)
 
+    # stats are only returned if requested to keep the return value same as before
+    if stats:
+        return fig, ax, stats
     return fig, ax
+
+
+def _read_block_lens(path, chrom_col='#CHROM', pos_col='POS', sep='\t', chunksize=1000000, **kwargs):
+    '''
+    Maximum positions of chromosomes in summary statistics, only chromosome and position columns are read,
+    other parameters of read_sumstats are ignored, so rows dropped by p_max or with nan p-values are also counted
+    return a dict of chromosome lengths, chromosomes are ordered by their first appearance like read_sumstats
+    '''
+    lens = {}
+    reader = pd.read_csv(path, sep=sep, usecols=[chrom_col, pos_col], dtype={chrom_col: str}, chunksize=chunksize,
+                         compression='infer')
+    for chunk in reader:
+        max_pos = chunk.groupby(chrom_col, sort=False)[pos_col].max()
+        for chrn, pos in zip(max_pos.index, max_pos.to_numpy(dtype=np.int64)):
+            lens[chrn] = max(lens.get(chrn, 0), int(pos))
+    if not lens:
+        raise ValueError("No data found in %s" % path)
+    return lens
+
+
+def _block_lens(data, columns=None, read_kws=None):
+    '''
+    Lengths of blocks in data, which are the maximum positions of blocks, paths of summary statistics are scanned
+    without p-values, which are parsed only once when traits are rendered
+    '''
+    if isinstance(data, str):
+        return _read_block_lens(data, **(read_kws if read_kws else {}))
+    codes, names, pos, _ = _load_columns(data, columns)
+    if codes is None:
+        raise ValueError("Data without blocks is not supported")
+    lens = np.zeros(len(names), dtype=np.int64)
+    np.maximum.at(lens, codes, pos)
+    return dict(zip(names, lens.tolist()))
+
+
+def _render_job(job):
+    '''
+    Render one figure without pyplot, so that figures are never kept by pyplot in worker processes
+    return a dict with output file, elapsed time, error message and stats of panels
+    '''
+    traits, output, layout, block_lens, figsize, dpi, read_kws, style = job
+    start = time.time()
+    result = {'output': output, 'time': 0, 'error': None, 'stats': []}
+    try:
+        fig = Figure(figsize=figsize, dpi=dpi)
+        axes = fig.subplots(len(traits), 1, sharex=True, squeeze=False)[:, 0]
+        for i in range(len(traits)):
+            data = traits[i]
+            if isinstance(data, str):
+                data = read_sumstats(data, **(read_kws if read_kws else {}))
+            kws = dict(style)
+            # only show x tick labels of the bottom panel
+            if i < len(traits) - 1:
+                kws['xtick_labels'] = False
+            ret = manhattan(data, ax=axes[i], block_lens=block_lens, **kws)
+            result['stats'].append(ret[2] if len(ret) == 3 else {})
+            if layout == 'miami' and i % 2 == 1:
+                axes[i].invert_yaxis()
+        fig.savefig(output)
+    except Exception:
+        result['error'] = traceback.format_exc()
+    result['time'] = time.time() - start
+    return result
+
+
+def manhattan_batch(traits, outputs, layout='single', block_lens=None, processes=None, figsize=(16, 4), dpi=100,
+                    columns=None, read_kws=None, **kwargs):
+    '''
+    Render manhattan plots of many traits to files with a process pool, all traits share the same block offsets,
+    traits could be data of manhattan or paths of summary statistics which are loaded with read_sumstats(read_kws),
+    for layout "single", each trait is rendered to a file, for "stacked" and "miami", each item of traits is a list
+    of traits rendered as panels of one figure, and every second panel is upside down for "miami"
+    return a list of dict with output file, elapsed time, error message (None if succeed) and stats of panels
+    '''
+    if layout not in {'single', 'stacked', 'miami'}:
+        raise ValueError("layout must be one of \"single\", \"stacked\" and \"miami\"")
+    if len(traits) != len(outputs):
+        raise ValueError("Count of outputs must be same with traits")
+    groups = [[_] for _ in traits] if layout == 'single' else [list(_) for _ in traits]
+
+    kwargs['columns'] = columns
+    if processes == 1:
+        mapper = map
+        executor = None
+    else:
+        executor = ProcessPoolExecutor(max_workers=processes)
+        mapper = executor.map
+    try:
+        # compute block offsets once for all traits, paths are read twice, but only chromosomes and positions
+        # are read for block offsets
+        if block_lens is None:
+            block_lens = {}
+            all_traits = [_ for group in groups for _ in group]
+            for lens in mapper(_block_lens, all_traits, [columns] * len(all_traits), [read_kws] * len(all_traits)):
+                for name in lens:
+                    block_lens[name] = max(block_lens.get(name, 0), lens[name])
+
+        jobs = [(groups[i], outputs[i], layout, block_lens, figsize, dpi, read_kws, kwargs)
+                for i in range(len(groups))]
+        results = list(mapper(_render_job, jobs))
+    finally:
+        if executor:
+            executor.shutdown()
+    return results
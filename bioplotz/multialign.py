@@ -1,18 +1,290 @@
+import gzip
+import mmap
+import os
+import tempfile
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib as mpl
 import matplotlib.pyplot as plt
-from matplotlib.transforms import Affine2D, offset_copy
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.backends.backend_pdf import PdfPages
+from matplotlib.collections import PathCollection, PolyCollection
+from matplotlib.colors import ListedColormap, NoNorm
+from matplotlib.figure import Figure
+from matplotlib.textpath import TextPath
+from matplotlib.transforms import Affine2D
+
+
+def _encode(data):
+    '''
+    Encode alignment to uint8 matrix, rows are sequences sorted by their names
+    return list of names and matrix with shape: (sequence count, alignment length)
+    '''
+    seq_list = sorted(data.keys())
+    lens = {len(data[_]) for _ in seq_list}
+    if len(lens) > 1:
+        raise ValueError("All sequences of alignment must have same length")
+    matrix = np.frombuffer(''.join(data[_] for _ in seq_list).encode('latin-1'), dtype=np.uint8)
+    return seq_list, matrix.reshape(len(seq_list), -1)
+
+
+class _Alignment(object):
+    '''
+    Aligned sequences stored as uint8 matrix with shape: (sequence count, alignment length), rows are in the order
+    of names, the matrix could be a np.memmap, and windows of columns are views of the matrix without copy
+    '''
+
+    def __init__(self, names, matrix):
+        if not isinstance(matrix, np.ndarray):
+            matrix = np.asarray(matrix)
+        if matrix.ndim != 2 or matrix.dtype != np.uint8:
+            raise ValueError("Matrix of alignment should be 2-D array with dtype uint8")
+        if len(names) != matrix.shape[0]:
+            raise ValueError("Count of names should be same as rows of matrix")
+        self.__names = list(names)
+        self.__matrix = matrix
+
+    def __len__(self):
+        return len(self.__names)
+
+    @property
+    def shape(self):
+        return self.__matrix.shape
+
+    def names(self):
+        return self.__names
+
+    def matrix(self):
+        return self.__matrix
+
+    def window(self, sp, ep):
+        '''
+        Columns from sp to ep (0-based, end exclusive) as a new alignment which shares the matrix
+        '''
+        return _Alignment(self.__names, self.__matrix[:, sp:ep])
+
+
+def alignment(data, names: list = None):
+    '''
+    Build alignment from dict of sequences (rows are sorted by names), or uint8 matrix with names of rows (default
+    is the index of rows), the alignment could be passed to multialign and reused
+    '''
+    if isinstance(data, _Alignment):
+        return data
+    if isinstance(data, dict):
+        return _Alignment(*_encode(data))
+    if names is None:
+        names = [str(_) for _ in range(len(data))]
+    return _Alignment(names, data)
+
+
+def _open(path):
+    return gzip.open(path, 'rb') if path.endswith('.gz') else open(path, 'rb')
+
+
+def _fasta_segments(path):
+    '''
+    Yield (name, segment) for each line of sequences in aligned FASTA file
+    '''
+    name = None
+    names = set()
+    with _open(path) as fin:
+        for line in fin:
+            if line.startswith(b'>'):
+                fields = line[1:].split()
+                name = fields[0].decode() if fields else ''
+                if name in names:
+                    raise ValueError("Duplicate sequence name in FASTA: %s" % name)
+                names.add(name)
+                yield name, b''
+                continue
+            line = line.strip()
+            if line and name is not None:
+                yield name, line
+
+
+def _block_segments(path, fmt):
+    '''
+    Yield (name, segment) for each line of sequences in interleaved Clustal or Stockholm file,
+    the header, annotations and conservation lines are skipped, only the first alignment in Stockholm file is read
+    '''
+    header = True
+    with _open(path) as fin:
+        for line in fin:
+            if not line.strip():
+                continue
+            if fmt == 'clustal':
+                if header:
+                    header = False
+                    continue
+                # lines of conservation start with spaces
+                if line[:1].isspace():
+                    continue
+            else:
+                if line.startswith(b'#'):
+                    continue
+                if line.startswith(b'//'):
+                    break
+            fields = line.split()
+            if len(fields) < 2:
+                raise ValueError("Wrong line in %s file: %s" % (fmt, line.decode(errors='replace').strip()))
+            yield fields[0].decode(), fields[1]
+
+
+def _read_aln(path, fmt, memmap_path, memmap_threshold):
+    '''
+    Read alignment with two passes, lengths of sequences are counted in the first pass, and segments are filled
+    into the matrix in the second pass, so only one line is kept in memory besides the matrix,
+    the matrix is saved as .npy file and memory-mapped (read only) if the size is not less than memmap_threshold
+    '''
+    segments = (lambda: _fasta_segments(path)) if fmt == 'fasta' else (lambda: _block_segments(path, fmt))
+    length_db = {}
+    for name, seg in segments():
+        length_db[name] = length_db.get(name, 0) + len(seg)
+    if not length_db:
+        raise ValueError("No sequence found in %s" % path)
+    if len(set(length_db.values())) > 1:
+        raise ValueError("All sequences of alignment must have same length")
+    names = list(length_db)
+    shape = (len(names), length_db[names[0]])
+
+    use_memmap = shape[0] * shape[1] >= memmap_threshold
+    if use_memmap:
+        if memmap_path is None:
+            memmap_path = path + '.aln.npy'
+        # write to a temporary file first to avoid broken matrix if interrupted
+        tmp = memmap_path + '.tmp.npy'
+        matrix = np.lib.format.open_memmap(tmp, mode='w+', dtype=np.uint8, shape=shape)
+    else:
+        matrix = np.empty(shape, dtype=np.uint8)
+    row_db = {name: i for i, name in enumerate(names)}
+    pos_db = dict.fromkeys(names, 0)
+    for name, seg in segments():
+        if seg:
+            pos = pos_db[name]
+            matrix[row_db[name], pos:pos + len(seg)] = np.frombuffer(seg, dtype=np.uint8)
+            pos_db[name] = pos + len(seg)
+
+    if use_memmap:
+        matrix.flush()
+        del matrix
+        os.replace(tmp, memmap_path)
+        matrix = np.load(memmap_path, mmap_mode='r')
+    return _Alignment(names, matrix)
+
+
+def read_aligned_fasta(path: str,
+                       memmap_path: str = None,
+                       memmap_threshold: int = 1 << 28):
+    '''
+    Read aligned FASTA file (could be gzipped), names are the first word of headers, rows are in the order of file,
+    the matrix is saved to memmap_path (default is path + ".aln.npy") and memory-mapped if the count of characters
+    is not less than memmap_threshold
+    return alignment which could be passed to multialign
+    '''
+    return _read_aln(path, 'fasta', memmap_path, memmap_threshold)
+
+
+def read_clustal(path: str,
+                 memmap_path: str = None,
+                 memmap_threshold: int = 1 << 28):
+    '''
+    Read Clustal file (could be gzipped), see read_aligned_fasta for details
+    '''
+    return _read_aln(path, 'clustal', memmap_path, memmap_threshold)
+
+
+def read_stockholm(path: str,
+                   memmap_path: str = None,
+                   memmap_threshold: int = 1 << 28):
+    '''
+    Read the first alignment in Stockholm file (could be gzipped), see read_aligned_fasta for details
+    '''
+    return _read_aln(path, 'stockholm', memmap_path, memmap_threshold)
+
+
+_GAP_CODES = np.frombuffer(b'-.', dtype=np.uint8)
+
+
+def _column_stats(matrix):
+    '''
+    Statistics of all columns computed in one vectorized pass over the counts of each character code
+    return dict of arrays with length of alignment:
+    match: all characters in the column are same
+    gap_fraction: fraction of gaps ("-" or ".") in the column
+    entropy: Shannon entropy (bits) of residues in the column, gaps are excluded
+    conservation: (1 - entropy / max entropy) * (1 - gap_fraction), max entropy is based on the residue count of
+    whole alignment, 1 means fully conserved
+    consensus: code of the most frequent residue in the column, or "-" if the column only contains gaps
+    '''
+    seq_cnt, aln_len = matrix.shape
+    codes = np.flatnonzero(np.bincount(np.asarray(matrix).reshape(-1), minlength=256))
+    counts = np.empty((len(codes), aln_len), dtype=np.int64)
+    for i, code in enumerate(codes):
+        counts[i] = np.count_nonzero(matrix == code, axis=0)
+
+    is_gap = np.isin(codes, _GAP_CODES)
+    gap_cnt = counts[is_gap].sum(axis=0)
+    residues = counts[~is_gap]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        freq = residues / (seq_cnt - gap_cnt)
+        entropy = np.where(freq > 0, freq * np.log2(1. / freq), 0.).sum(axis=0)
+    gap_fraction = gap_cnt / seq_cnt
+    max_entropy = np.log2(len(residues)) if len(residues) > 1 else 1.
+
+    consensus = np.full(aln_len, ord('-'), dtype=np.uint8)
+    if len(residues):
+        has_residue = gap_cnt < seq_cnt
+        consensus[has_residue] = codes[~is_gap][residues.argmax(axis=0)][has_residue]
+    return {
+        "match": counts.max(axis=0) == seq_cnt,
+        "gap_fraction": gap_fraction,
+        "entropy": entropy,
+        "conservation": np.clip(1. - entropy / max_entropy, 0., 1.) * (1. - gap_fraction),
+        "consensus": consensus
+    }
+
+
+def column_stats(data):
+    '''
+    Per-column statistics of alignment (dict of sequences or alignment), see _column_stats for details,
+    consensus is returned as string
+    '''
+    stats = _column_stats(alignment(data).matrix())
+    stats["consensus"] = stats["consensus"].tobytes().decode('latin-1')
+    return stats
 
 
 class _MultiAlign(object):
 
     def __init__(self,
-                 data: dict,
+                 data,
                  base_per_line: int = 80,
                  color_mode: str = 'match',
-                 color_kws: dict = None):
-        self.__data = data
+                 color_kws: dict = None,
+                 render: str = 'text',
+                 conservation: bool = False,
+                 window: tuple = None):
+        self.__alignment = alignment(data)
+        # window of columns (0-based, end exclusive) is a view of alignment, positions are still counted from the
+        # start of whole alignment
+        self.__offset = 0
+        if window is not None:
+            sp, ep = window
+            if sp < 0 or sp >= ep or sp >= self.__alignment.shape[1]:
+                raise ValueError("Start of window must in alignment and smaller than end")
+            self.__alignment = self.__alignment.window(sp, ep)
+            self.__offset = sp
         self.__base_per_line = base_per_line
         self.__color_mode = color_mode
         self.__color_kws = None
+        if render not in {'text', 'raster'}:
+            raise ValueError("Value of render should be \"text\" or \"raster\"")
+        self.__render = render
+        self.__conservation = conservation
 
         # set default values of sel.__color_kws
         if self.__color_mode == "match":
@@ -23,7 +295,8 @@ class _MultiAlign(object):
                 "mismatch_background_color": None,
                 "highlight_positions": None,
                 "highlight_color": 'green',
-                "highlight_background_color": None
+                "highlight_background_color": None,
+                "conservation_color": 'grey'
             }
         elif self.__color_mode == "base":
             self.__color_kws = {
@@ -51,7 +324,8 @@ class _MultiAlign(object):
                     "V": "violet", "v": "violet",
                     "W": "mediumturquoise", "w": "mediumturquoise",
                     "Y": "deepskyblue", "y": "deepskyblue"
-                }
+                },
+                "conservation_color": 'grey'
             }
 
         else:
@@ -71,63 +345,222 @@ class _MultiAlign(object):
                 if "base_background_color" in color_kws:
                     for key in color_kws["base_background_color"]:
                         self.__color_kws["base_background_color"][key] = color_kws["base_background_color"][key]
+                if "conservation_color" in color_kws:
+                    self.__color_kws["conservation_color"] = color_kws["conservation_color"]
 
         if "highlight_positions" in self.__color_kws and self.__color_kws["highlight_positions"]:
             self.__color_kws["highlight_positions"] = set(self.__color_kws["highlight_positions"])
 
     @staticmethod
-    def __rainbow_text(x, y, strings, colors, background_colors, ax=None, **kwargs):
+    def __draw_grid(ax, palette, glyphs, cells, bars=None, bar_color='grey', **kwargs):
         """
-        Take a list of *strings* and *colors* and place them next to each
-        other, with text strings[i] being shown in colors[i].
-
-        Parameters
-        ----------
-        x, y : float
-            Text position in data coordinates.
-        strings : list of str
-            The strings to draw.
-        colors : list of color
-            The colors to use.
-        ax : Axes, optional
-            The Axes to draw into. If None, the current axes will be used.
-        **kwargs
-            All other keyword arguments are passed to plt.text(), so you can
-            set the font size, family, etc.
+        Draw characters and backgrounds on grid, the width of grid is measured with one text of monospace font,
+        *glyphs* are arrays of (y, column, character code, index of color in *palette*), *cells* are arrays of
+        (y, column, index of background color), and *bars* are arrays of (y, column, height in fraction of cell),
+        index 0 of palette means default color of text for characters, and no background for cells,
+        all backgrounds are drawn as one PolyCollection, and characters with same color are drawn as one
+        PathCollection of glyph path, so the figure is rendered once without drawing each character
         """
-        if ax is None:
-            ax = plt.gca()
-        t = ax.transData
         fig = ax.figure
-        canvas = fig.canvas
+        text = ax.text(0, 0, 'M' * 100, transform=ax.transData, **kwargs)
+        ex = text.get_window_extent(fig.canvas.get_renderer())
+        anchor_y = ax.transData.transform((0, 0))[1]
+        prop = text.get_fontproperties()
+        alpha = text.get_alpha()
+        zorder = text.get_zorder()
+        default_color = text.get_color()
+        text.remove()
+        # size of one cell in inches, bottom and top are relative to baseline
+        width = ex.width / 100. / fig.dpi
+        bottom = (ex.y0 - anchor_y) / fig.dpi
+        top = (ex.y1 - anchor_y) / fig.dpi
 
-        for s, c, bc in zip(strings, colors, background_colors):
-            if bc:
-                text = ax.text(x, y, s, color=c,
-                               bbox=dict(facecolor=bc, linewidth=0, pad=0),
-                               transform=t, **kwargs)
-            else:
-                text = ax.text(x, y, s, color=c, transform=t, **kwargs)
+        # columns of grid are data coordinates of x axis
+        ax_width = ax.get_position().width * fig.get_size_inches()[0]
+        ax.set_xlim(0, ax_width / width)
+        rgba = np.zeros((len(palette), 4))
+        if len(palette) > 1:
+            rgba[1:] = mpl.colors.to_rgba_array(palette[1:])
+        cell_y, cell_col, cell_color = cells
+        is_cell = cell_color != 0
+        if is_cell.any():
+            verts = np.array([[[0, bottom], [width, bottom], [width, top], [0, top]]])
+            background = PolyCollection(verts, offsets=np.column_stack([cell_col[is_cell], cell_y[is_cell]]),
+                                        offset_transform=ax.transData, transform=fig.dpi_scale_trans,
+                                        facecolors=rgba[cell_color[is_cell]], edgecolors='none',
+                                        zorder=zorder - .5)
+            background.set_clip_on(False)
+            ax.add_collection(background, autolim=False)
+        if bars is not None and len(bars[0]):
+            bar_y, bar_col, bar_height = bars
+            verts = np.zeros((len(bar_y), 4, 2))
+            verts[:, 1:3, 0] = width
+            verts[:, :2, 1] = bottom
+            verts[:, 2:, 1] = (bottom + (top - bottom) * np.asarray(bar_height))[:, None]
+            track = PolyCollection(verts, offsets=np.column_stack([bar_col, bar_y]),
+                                   offset_transform=ax.transData, transform=fig.dpi_scale_trans,
+                                   facecolors=bar_color, edgecolors='none', zorder=zorder - .5)
+            track.set_clip_on(False)
+            ax.add_collection(track, autolim=False)
 
-            # Need to draw to update the text position.
-            text.draw(canvas.get_renderer())
-            ex = text.get_window_extent()
-            # Convert window extent from pixels to inches
-            # to avoid issues displaying at different dpi
-            ex = fig.dpi_scale_trans.inverted().transform_bbox(ex)
-            t = text.get_transform() + offset_copy(Affine2D(), fig=fig, x=ex.width, y=0)
+        glyph_y, glyph_col, glyph_code, glyph_color = glyphs
+        if not len(glyph_y):
+            return
+        keys = glyph_code.astype(np.int64) * len(palette) + glyph_color
+        order = np.argsort(keys, kind='stable')
+        layer_keys, starts = np.unique(keys[order], return_index=True)
+        offsets = np.column_stack([glyph_col, glyph_y]).astype(np.float64)[order]
+        path_db = {}
+        for key, layer_offsets in zip(layer_keys, np.split(offsets, starts[1:])):
+            code, color_idx = divmod(int(key), len(palette))
+            s = chr(code)
+            if s not in path_db:
+                path_db[s] = TextPath((0, 0), s, prop=prop).transformed(Affine2D().scale(1. / 72))
+            c = default_color if color_idx == 0 else palette[color_idx]
+            glyph = PathCollection([path_db[s]], offsets=layer_offsets,
+                                   offset_transform=ax.transData, transform=fig.dpi_scale_trans,
+                                   facecolors=[c], edgecolors='none', alpha=alpha, zorder=zorder)
+            # rectangle glyphs like "-" may be snapped to nothing
+            glyph.set_snap(False)
+            glyph.set_clip_on(False)
+            ax.add_collection(glyph, autolim=False)
+
+    def __column_states(self, stats):
+        '''
+        States of columns in "match" mode, 0 (match), 1 (mismatch) or 2 (highlight)
+        '''
+        states = np.where(stats["match"], 0, 1).astype(np.uint8)
+        if self.__color_kws["highlight_positions"]:
+            pos = np.array(sorted(self.__color_kws["highlight_positions"]), dtype=np.int64) - self.__offset
+            states[pos[(pos >= 0) & (pos < len(states))]] = 2
+        return states
+
+    def __cell_colors(self, matrix, stats):
+        '''
+        Colors of characters and backgrounds of cells in text mode, colors are collected into a palette, and looked
+        up by codes of characters in "base" mode or by states of columns in "match" mode
+        return palette and two arrays of indices in palette with same shape of matrix for characters and backgrounds,
+        index 0 is None which means default color of text for characters, and no background for cells,
+        index 1 and 2 are "black" and "white" used by lines of positions
+        '''
+        palette = [None, "black", "white"]
+        index_db = {"black": 1, "white": 2}
+
+        def index(color):
+            if color is None:
+                return 0
+            key = color if isinstance(color, str) else tuple(color)
+            if key not in index_db:
+                index_db[key] = len(palette)
+                palette.append(color)
+            return index_db[key]
+
+        if self.__color_mode == "match":
+            states = ["match", "mismatch", "highlight"]
+            color_lut = np.array([index(self.__color_kws["%s_color" % _]) for _ in states])
+            background_lut = np.array([index(self.__color_kws["%s_background_color" % _]) for _ in states])
+            col_states = self.__column_states(stats)
+            return (palette, np.broadcast_to(color_lut[col_states], matrix.shape),
+                    np.broadcast_to(background_lut[col_states], matrix.shape))
+
+        color_lut = np.full(256, index("black"))
+        background_lut = np.full(256, index("white"))
+        for base, color in self.__color_kws["base_color"].items():
+            if len(base) == 1 and ord(base) < 256:
+                color_lut[ord(base)] = index(color)
+        for base, color in self.__color_kws["base_background_color"].items():
+            if len(base) == 1 and ord(base) < 256:
+                background_lut[ord(base)] = index(color)
+        return palette, color_lut[matrix], background_lut[matrix]
+
+    def __raster_codes(self, matrix, stats):
+        '''
+        Codes of cells and lookup table of colors for raster mode, code 0 is white for blank cells,
+        in "base" mode, codes are characters and colors are background colors of characters,
+        in "match" mode, columns are coded as 1 (match), 2 (mismatch) or 3 (highlight), and colors are background
+        colors, or colors of characters if background colors are not set
+        return codes with same shape of matrix and lookup table with shape: (256, 4)
+        '''
+        lut = np.tile(mpl.colors.to_rgba('white'), (256, 1))
+        if self.__color_mode == "base":
+            for base, color in self.__color_kws["base_background_color"].items():
+                if len(base) == 1 and ord(base) < 256 and color:
+                    lut[ord(base)] = mpl.colors.to_rgba(color)
+            lut[0] = mpl.colors.to_rgba('white')
+            return matrix, lut
+
+        states = self.__column_states(stats) + 1
+        for code, state in enumerate(["match", "mismatch", "highlight"]):
+            color = self.__color_kws["%s_background_color" % state] or self.__color_kws["%s_color" % state]
+            lut[code + 1] = mpl.colors.to_rgba(color if color else 'white')
+        return np.broadcast_to(states, matrix.shape), lut
+
+    def __plot_raster(self, ax, **kwargs):
+        '''
+        Plot alignment as one image without characters, blocks of base_per_line columns are stacked like text mode,
+        colors are mapped from codes of cells with lookup table when the image is rendered
+        '''
+        seq_list, matrix = self.__alignment.names(), self.__alignment.matrix()
+        seq_cnt, aln_len = matrix.shape
+        stats = _column_stats(matrix)
+        row_cnt = -(-aln_len // self.__base_per_line)
+        track = 1 if self.__conservation else 0
+        block_height = seq_cnt + 2 + track
+        codes, lut = self.__raster_codes(matrix, stats)
+
+        # each block contains a blank line for positions, an optional line of conservation track,
+        # lines of sequences, and a blank line
+        image = np.zeros((row_cnt, block_height, self.__base_per_line), dtype=np.uint8)
+        padded = np.zeros((seq_cnt, row_cnt * self.__base_per_line), dtype=np.uint8)
+        padded[:, :aln_len] = codes
+        image[:, track + 1:track + seq_cnt + 1, :] = padded.reshape(seq_cnt, row_cnt, self.__base_per_line
+                                                                    ).transpose(1, 0, 2)
+        image = image.reshape(row_cnt * block_height, self.__base_per_line)
+        ax.imshow(image, cmap=ListedColormap(lut), norm=NoNorm(), interpolation='nearest', aspect='auto',
+                  extent=(-.5, self.__base_per_line - .5, row_cnt * block_height - .5, -.5))
+
+        if track:
+            pos = np.arange(aln_len)
+            x = (pos % self.__base_per_line)[:, None] + np.array([-.5, .5, .5, -.5])
+            y = (pos // self.__base_per_line * block_height + 1.5)[:, None] \
+                - stats["conservation"][:, None] * np.array([0, 0, 1, 1])
+            bars = PolyCollection(np.stack([x, y], axis=-1), facecolors=self.__color_kws["conservation_color"],
+                                  edgecolors='none')
+            ax.add_collection(bars, autolim=False)
+        for i in range(row_cnt):
+            sp = i * self.__base_per_line
+            ep = min(aln_len, sp + self.__base_per_line)
+            ax.text(-.5, i * block_height, "%d-%d" % (self.__offset + sp + 1, self.__offset + ep), ha='left',
+                    va='center', **kwargs)
+        # names of sequences are thinned if they could not be shown in the height of lines
+        fig = ax.figure
+        line_px = ax.get_window_extent().height / (row_cnt * block_height)
+        label_px = mpl.font_manager.FontProperties(size=mpl.rcParams['ytick.labelsize']).get_size_in_points() \
+            * fig.dpi / 72.
+        step = max(int(np.ceil(label_px / line_px)), 1)
+        seq_idx = np.arange(0, seq_cnt, step)
+        y_ticks = (np.arange(row_cnt)[:, None] * block_height + track + seq_idx + 1).reshape(-1)
+        ax.set_ylim(row_cnt * block_height - .5, -.5)
+        ax.set_xticks([])
+        ax.set_yticks(y_ticks, [seq_list[_] for _ in seq_idx] * row_cnt)
+        for i in ax.spines:
+            ax.spines[i].set_visible(False)
+        ax.tick_params('both', length=0)
 
     def plot(self, ax, **kwargs):
-        aln_len = 0
-        for gid in self.__data:
-            aln_len = len(self.__data[gid])
-            break
-        seq_cnt = len(self.__data)
-        seq_list = sorted(self.__data.keys())
+        if self.__render == 'raster':
+            self.__plot_raster(ax, **kwargs)
+            return
+        seq_list, matrix = self.__alignment.names(), self.__alignment.matrix()
+        seq_cnt, aln_len = matrix.shape
+        stats = _column_stats(matrix)
+        palette, colors, background_colors = self.__cell_colors(matrix, stats)
         row_cnt = int(aln_len * 1. / self.__base_per_line)
         if row_cnt * self.__base_per_line < aln_len:
             row_cnt += 1
-        total_row_cnt = (row_cnt + 2) * seq_cnt
+        track = 1 if self.__conservation else 0
+        block_height = seq_cnt + 2 + track
+        total_row_cnt = row_cnt * block_height
 
         divide_repeat_cnt = int(self.__base_per_line / 5.)
         if divide_repeat_cnt * 5 < self.__base_per_line:
@@ -136,79 +569,181 @@ class _MultiAlign(object):
         divide = '----+' * divide_repeat_cnt
         divide = divide[:self.__base_per_line]
 
-        y_ticks = []
-        y_labels = []
+        # monospace font is used to keep characters on grid
+        if 'family' not in kwargs and 'fontfamily' not in kwargs and 'fontproperties' not in kwargs:
+            kwargs['family'] = 'monospace'
+
+        # each block contains a line of divide and positions, an optional line of conservation track,
+        # lines of sequences, and a blank line
+        pos = np.arange(aln_len)
+        cols = np.broadcast_to(pos % self.__base_per_line, matrix.shape)
+        ys = (pos // self.__base_per_line * block_height + track + 1)[None, :] + np.arange(seq_cnt)[:, None]
+        is_char = matrix != ord(' ')
+        glyphs = [ys[is_char], cols[is_char], matrix[is_char], colors[is_char]]
+        cells = [ys.reshape(-1), cols.reshape(-1), background_colors.reshape(-1)]
+
+        header = [[], [], [], []]
         for i in range(row_cnt):
             sp = i * self.__base_per_line
             ep = min(aln_len, sp + self.__base_per_line)
+            divide_and_pos = "%s %d-%d" % (divide, self.__offset + sp + 1, self.__offset + ep)
+            divide_and_pos = np.frombuffer(divide_and_pos.encode('latin-1'), dtype=np.uint8)
+            header[0].append(np.full(len(divide_and_pos), i * block_height))
+            header[1].append(np.arange(len(divide_and_pos)))
+            header[2].append(divide_and_pos)
+            header[3].append(divide_and_pos != ord(' '))
+        header_y, header_cols, header_codes, is_char = [np.concatenate(_) for _ in header]
+        # colors of lines of positions are black on white
+        glyphs = [np.concatenate([glyphs[0], header_y[is_char]]),
+                  np.concatenate([glyphs[1], header_cols[is_char]]),
+                  np.concatenate([glyphs[2], header_codes[is_char]]),
+                  np.concatenate([glyphs[3], np.full(is_char.sum(), 1)])]
+        cells = [np.concatenate([cells[0], header_y]),
+                 np.concatenate([cells[1], header_cols]),
+                 np.concatenate([cells[2], np.full(len(header_y), 2)])]
 
-            divide_and_pos = "%s %d-%d" % (divide, sp + 1, ep)
-            colors = ['black' for _ in range(len(divide_and_pos))]
-            background_colors = ['white' for _ in range(len(divide_and_pos))]
-            self.__rainbow_text(0, i * (seq_cnt + 2), list(divide_and_pos), colors, background_colors, **kwargs)
-
-            colors = ["black" for _ in range(ep - sp)]
-            background_colors = ["white" for _ in range(ep - sp)]
-
-            if self.__color_mode == "match":
-                for k in range(sp, ep):
-                    cur_set = set()
-                    for j in sorted(self.__data):
-                        cur_set.add(self.__data[j][k])
-                    if len(cur_set) > 1:
-                        colors[k - sp] = self.__color_kws["mismatch_color"]
-                        background_colors[k - sp] = self.__color_kws["mismatch_background_color"]
-                    else:
-                        colors[k - sp] = self.__color_kws["match_color"]
-                        background_colors[k - sp] = self.__color_kws["match_background_color"]
-                    if self.__color_kws["highlight_positions"] and k in self.__color_kws["highlight_positions"]:
-                        colors[k - sp] = self.__color_kws["highlight_color"]
-                        background_colors[k - sp] = self.__color_kws["highlight_background_color"]
-
-                for j in range(seq_cnt):
-                    gid = seq_list[j]
-                    y_ticks.append(i * (seq_cnt + 2) + j + 1)
-                    y_labels.append(gid)
-                    self.__rainbow_text(0, i * (seq_cnt + 2) + j + 1, self.__data[gid][sp: ep],
-                                        colors, background_colors, **kwargs)
-            elif self.__color_mode == "base":
-                for j in range(seq_cnt):
-                    gid = seq_list[j]
-                    y_ticks.append(i * (seq_cnt + 2) + j + 1)
-                    y_labels.append(gid)
-                    for k in range(sp, ep):
-                        colors[k - sp] = self.__color_kws["base_color"][self.__data[gid][k]] \
-                            if self.__data[gid][k] in self.__color_kws["base_color"] \
-                            else "black"
-                        background_colors[k - sp] = self.__color_kws["base_background_color"][self.__data[gid][k]] \
-                            if self.__data[gid][k] in self.__color_kws["base_background_color"] \
-                            else "white"
-                    self.__rainbow_text(0, i * (seq_cnt + 2) + j + 1, self.__data[gid][sp: ep],
-                                        colors, background_colors, **kwargs)
-
+        bars = None
+        if track:
+            bars = (pos // self.__base_per_line * block_height + 1, pos % self.__base_per_line,
+                    stats["conservation"])
+        self.__draw_grid(ax, palette, glyphs, cells, bars, self.__color_kws["conservation_color"], **kwargs)
+        y_ticks = (np.arange(row_cnt)[:, None] * block_height + track + np.arange(seq_cnt) + 1).reshape(-1)
         ax.set_ylim(0, total_row_cnt)
         ax.set_xticks([])
         ax.invert_yaxis()
-        ax.set_yticks(y_ticks, y_labels)
+        ax.set_yticks(y_ticks, seq_list * row_cnt)
         for i in ax.spines:
             ax.spines[i].set_visible(False)
         ax.tick_params('both', length=0)
 
 
-def multialign(data: dict,
+def multialign(data,
                base_per_line: int = 80,
                color_mode: str = "match",
                color_kws: dict = None,
+               render: str = "text",
+               conservation: bool = False,
+               window: tuple = None,
+               ax=None,
                **kwargs):
     plotter = _MultiAlign(data,
                           base_per_line,
                           color_mode,
-                          color_kws)
+                          color_kws,
+                          render,
+                          conservation,
+                          window)
 
-    if not plt:
-        plt.figure()
-    fig = plt.gcf()
-    ax = plt.gca()
+    if ax is None:
+        if not plt:
+            plt.figure()
+        ax = plt.gca()
+    fig = ax.figure
     plotter.plot(ax, **kwargs)
 
     return fig, ax
+
+
+# alignment shared by pages in worker process, which is opened once by _init_page_worker
+_page_alignment = None
+
+
+def _init_page_worker(names, path, offset, shape):
+    '''
+    Open the shared alignment as read-only memory map in worker process, so pages never copy the alignment
+    '''
+    global _page_alignment
+    _page_alignment = _Alignment(names, np.memmap(path, dtype=np.uint8, mode='r', offset=offset, shape=shape))
+
+
+def _render_page(job, aln=None, pdf=None):
+    '''
+    Render one page without pyplot, so that figures are never kept by pyplot, the page is saved to pdf if set,
+    the alignment opened by _init_page_worker is used if aln is None
+    return a dict with output file, page number, elapsed time and error message
+    '''
+    page, sp, ep, output, figsize, dpi, style = job
+    start = time.time()
+    result = {'output': output, 'page': page, 'time': 0, 'error': None}
+    try:
+        fig = Figure(figsize=figsize, dpi=dpi)
+        # canvas of Agg is used to measure characters
+        FigureCanvasAgg(fig)
+        multialign(_page_alignment if aln is None else aln, window=(sp, ep), ax=fig.add_subplot(), **style)
+        if pdf is not None:
+            pdf.savefig(fig)
+        else:
+            fig.savefig(output)
+    except Exception:
+        result['error'] = traceback.format_exc()
+    result['time'] = time.time() - start
+    return result
+
+
+def multialign_pages(data,
+                     output: str,
+                     blocks_per_page: int = 10,
+                     window: tuple = None,
+                     base_per_line: int = 80,
+                     processes: int = None,
+                     figsize: tuple = None,
+                     dpi: int = 100,
+                     **kwargs):
+    '''
+    Render alignment (or window of columns, 0-based and end exclusive) to pages with blocks_per_page blocks of
+    base_per_line columns, only one page is laid out at a time in each process, so memory is bounded by page size,
+    if output ends with ".pdf", pages are written to one multi-page PDF in current process, otherwise pages are
+    rendered with a process pool to numbered files like "aln_01.png" for output "aln.png", the alignment is shared
+    with worker processes as read-only memory map (a temporary .npy file is written if it is not memory-mapped),
+    other parameters are same with multialign
+    return a list of dict with output file, page number, elapsed time and error message (None if succeed)
+    '''
+    aln = alignment(data)
+    seq_cnt, aln_len = aln.shape
+    sp, ep = window if window is not None else (0, aln_len)
+    ep = min(ep, aln_len)
+    if sp < 0 or sp >= ep:
+        raise ValueError("Start of window must in alignment and smaller than end")
+    if blocks_per_page < 1:
+        raise ValueError("blocks_per_page must larger than 0")
+    page_len = blocks_per_page * base_per_line
+    page_cnt = -(-(ep - sp) // page_len)
+    if figsize is None:
+        figsize = (base_per_line / 8. + 2., max(blocks_per_page * (seq_cnt + 2) / 5., 1.))
+    style = dict(kwargs, base_per_line=base_per_line)
+
+    is_pdf = output.lower().endswith('.pdf')
+    prefix, suffix = os.path.splitext(output)
+    width = len(str(page_cnt))
+    jobs = []
+    for i in range(page_cnt):
+        page_sp = sp + i * page_len
+        page_output = output if is_pdf else "%s_%0*d%s" % (prefix, width, i + 1, suffix)
+        jobs.append((i + 1, page_sp, min(ep, page_sp + page_len), page_output, figsize, dpi, style))
+
+    if is_pdf:
+        with PdfPages(output) as pdf:
+            return [_render_page(_, aln, pdf) for _ in jobs]
+    if processes == 1:
+        return [_render_page(_, aln) for _ in jobs]
+
+    matrix = aln.matrix()
+    tmp = None
+    # memory map of whole file could be reopened directly, otherwise the matrix is saved to a temporary file
+    if isinstance(matrix, np.memmap) and isinstance(matrix.base, mmap.mmap):
+        shared = (matrix.filename, matrix.offset, matrix.shape)
+    else:
+        fd, tmp = tempfile.mkstemp(suffix='.npy')
+        os.close(fd)
+        np.save(tmp, matrix)
+        saved = np.load(tmp, mmap_mode='r')
+        shared = (tmp, saved.offset, saved.shape)
+        del saved
+    try:
+        with ProcessPoolExecutor(max_workers=processes, initializer=_init_page_worker,
+                                 initargs=(aln.names(),) + shared) as executor:
+            results = list(executor.map(_render_page, jobs))
+    finally:
+        if tmp:
+            os.remove(tmp)
+    return results
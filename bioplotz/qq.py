@@ -0,0 +1,157 @@
+from statistics import NormalDist
+
+import matplotlib.pyplot as plt
+import numpy as np
+
+from .manhattan import _load_columns
+
+# median of chi-squared distribution with 1 degree of freedom
+_CHI2_MEDIAN = 0.454936423119572
+
+
+def _median_to_lambda(p_median):
+    return NormalDist().inv_cdf(1. - p_median / 2.) ** 2 / _CHI2_MEDIAN
+
+
+def lambda_gc(p, exact=True, bins=1 << 20):
+    '''
+    Genomic inflation factor of p-values
+    exact median is found with np.partition, otherwise the median is approximated with a histogram of p-values
+    with *bins* bins, p could also be an iterable of arrays (like chunks of a file) for the approximate mode,
+    which are counted one by one without keeping them in memory
+    '''
+    if exact:
+        p = np.asarray(p, dtype=np.float64)
+        p = p[~np.isnan(p)]
+        if len(p) == 0:
+            raise ValueError("No valid p-value found")
+        return _median_to_lambda(np.median(p))
+
+    # iterators like generators are counted chunk by chunk
+    if hasattr(p, '__len__'):
+        p = [p]
+    counts = np.zeros(bins, dtype=np.int64)
+    for chunk in p:
+        chunk = np.asarray(chunk, dtype=np.float64)
+        chunk = chunk[~np.isnan(chunk)]
+        idx = np.clip((chunk * bins).astype(np.int64), 0, bins - 1)
+        counts += np.bincount(idx, minlength=bins)
+    total = counts.sum()
+    if total == 0:
+        raise ValueError("No valid p-value found")
+    # linear interpolation in the bin which contains the median
+    cum = np.cumsum(counts)
+    half = total / 2.
+    i = int(np.searchsorted(cum, half))
+    before = cum[i - 1] if i > 0 else 0
+    p_median = (i + (half - before) / counts[i]) / bins
+    return _median_to_lambda(p_median)
+
+
+class _QQ(object):
+    def __init__(self, data, log10p=False, columns=None, color='steelblue', line_color='lightgrey', exact_tail=1e-3,
+                 exact_median=True, thin_dpi=None, show_lambda=True):
+        if isinstance(data, (list, np.ndarray)) and np.ndim(data) == 1:
+            values = np.asarray(data)
+        else:
+            _, _, _, values = _load_columns(data, columns)
+
+        # convert all values to -log10(p), p-value of 0 is kept as the smallest positive value
+        if log10p:
+            values = values.astype(np.float64, copy=False)
+        else:
+            values = -np.log10(np.maximum(values, np.finfo(np.float64).tiny))
+        nan = np.isnan(values)
+        if nan.any():
+            values = values[~nan]
+        if len(values) == 0:
+            raise ValueError("No valid p-value found")
+
+        self.__values = values
+        self.__cnt = len(values)
+        self.__color = color
+        self.__line_color = line_color
+        self.__exact_tail = exact_tail
+        self.__exact_median = exact_median
+        self.__thin_dpi = thin_dpi
+        self.__show_lambda = show_lambda
+
+    def __expected(self, ranks):
+        # ranks start from 0 for the most significant point
+        return -np.log10((ranks + .5) / self.__cnt)
+
+    def __dense_ranks(self, ax, tail_cnt, e_max):
+        '''
+        Ranks of points out of tail, sampled with half pixel of expected values
+        '''
+        n = self.__cnt
+        if tail_cnt >= n:
+            return np.array([], dtype=np.int64)
+        fig = ax.figure
+        dpi = self.__thin_dpi if self.__thin_dpi else fig.dpi
+        width = max(int(np.ceil(ax.get_window_extent().width * dpi / fig.dpi)), 1)
+        e_tail = self.__expected(tail_cnt)
+        e_grid = np.linspace(0, e_tail, int(np.ceil(e_tail / e_max * width)) * 2 + 2)
+        ranks = np.floor(n * np.power(10., -e_grid) - .5).astype(np.int64)
+        return np.unique(np.clip(ranks, tail_cnt, n - 1))
+
+    def plot(self, ax, marker, s, kws):
+        values = self.__values
+        n = self.__cnt
+        e_max = self.__expected(0)
+
+        # tail points are sorted exactly
+        if self.__exact_tail is None:
+            tail = np.sort(values)[::-1]
+        else:
+            tail = values[values >= -np.log10(self.__exact_tail)]
+            tail = np.sort(tail)[::-1]
+        tail_cnt = len(tail)
+        o_max = tail[0] if tail_cnt else values.max()
+        y_max = max(o_max, e_max)
+        ax.set(xlim=(0, e_max), ylim=(0, y_max))
+
+        # observed values of sampled ranks and median are found with one partition
+        ranks = self.__dense_ranks(ax, tail_cnt, e_max)
+        median_kth = np.unique([(n - 1) // 2, n // 2])
+        kth = np.unique(np.concatenate([n - 1 - ranks, median_kth]))
+        part = np.partition(values, kth)
+        dense = part[n - 1 - ranks]
+        if self.__exact_median:
+            p_median = np.power(10., -part[median_kth]).mean()
+            lambda_value = _median_to_lambda(p_median)
+        else:
+            lambda_value = lambda_gc(np.power(10., -values), exact=False)
+        del part
+
+        expected = np.concatenate([self.__expected(np.arange(tail_cnt)), self.__expected(ranks)])
+        observed = np.concatenate([tail, dense])
+
+        ax.plot([0, e_max], [0, e_max], color=self.__line_color, lw=1, linestyle=':')
+        ax.scatter(expected, observed, color=self.__color, marker=marker, s=s, **kws)
+        if self.__show_lambda:
+            ax.text(0.05, 0.95, r"$\lambda_{GC}$ = %.3f" % lambda_value, transform=ax.transAxes, ha='left',
+                    va='top')
+        ax.set_xlabel("Expected -log10(p)")
+        ax.set_ylabel("Observed -log10(p)")
+
+        ax.tick_params(axis='both', which='both', length=0)
+        for i in ax.spines:
+            ax.spines[i].set_linewidth(0.5)
+            ax.spines[i].set_color('lightgrey')
+
+        return lambda_value
+
+
+def qq(data, log10p=False, columns=None, color='steelblue', line_color='lightgrey', exact_tail=1e-3,
+       exact_median=True, thin_dpi=None, show_lambda=True, ax=None, marker='.', s=1, **kwargs):
+    plotter = _QQ(data, log10p, columns, color, line_color, exact_tail, exact_median, thin_dpi, show_lambda)
+
+    if ax is None:
+        if not plt:
+            plt.figure()
+        ax = plt.gca()
+    fig = ax.figure
+    lambda_value = plotter.plot(ax, marker, s, kwargs)
+
+    return fig, ax, lambda_value